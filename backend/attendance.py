@@ -0,0 +1,89 @@
+from typing import Iterable
+
+from sqlalchemy import delete, exists, insert, literal, select
+from sqlalchemy.orm import Session
+
+from models import Event, Participant, event_participant
+
+
+def lock_event(db: Session, event_id: int) -> bool:
+    """
+    Row-locks the event so concurrent attendance edits on it are serialized.
+    Returns False if the event does not exist.
+    """
+    found = db.execute(select(Event.id).where(Event.id == event_id).with_for_update()).first()
+    return found is not None
+
+
+def unknown_participants(db: Session, participant_ids: Iterable[int]) -> list[int]:
+    ids = set(participant_ids)
+    if not ids:
+        return []
+    known = set(db.scalars(select(Participant.id).where(Participant.id.in_(ids))))
+    return sorted(ids - known)
+
+
+def add_participants(db: Session, event_id: int, participant_ids: Iterable[int]) -> list[int]:
+    """
+    Links participants to the event, skipping existing links. Returns the added ids.
+    """
+    ids = set(participant_ids)
+    if not ids:
+        return []
+
+    already_linked = exists().where(
+        event_participant.c.event_id == event_id,
+        event_participant.c.participant_id == Participant.id,
+    )
+    stmt = (
+        insert(event_participant)
+        .from_select(
+            ["event_id", "participant_id"],
+            select(literal(event_id), Participant.id).where(Participant.id.in_(ids), ~already_linked),
+        )
+        .returning(event_participant.c.participant_id)
+    )
+    return sorted(db.scalars(stmt))
+
+
+def remove_participants(db: Session, event_id: int, participant_ids: Iterable[int]) -> list[int]:
+    """
+    Unlinks participants from the event. Returns the removed ids.
+    """
+    ids = set(participant_ids)
+    if not ids:
+        return []
+
+    stmt = (
+        delete(event_participant)
+        .where(event_participant.c.event_id == event_id, event_participant.c.participant_id.in_(ids))
+        .returning(event_participant.c.participant_id)
+    )
+    return sorted(set(db.scalars(stmt)))
+
+
+def set_participants(db: Session, event_id: int, participant_ids: Iterable[int]) -> tuple[list[int], list[int]]:
+    """
+    Makes the event's participants exactly participant_ids, diffing against event_participant
+    in SQL: one DELETE for the links not wanted anymore, one INSERT for the missing ones.
+    Returns (added, removed).
+    """
+    ids = set(participant_ids)
+
+    stmt = delete(event_participant).where(event_participant.c.event_id == event_id)
+    if ids:
+        stmt = stmt.where(event_participant.c.participant_id.not_in(ids))
+    removed = sorted(set(db.scalars(stmt.returning(event_participant.c.participant_id))))
+
+    added = add_participants(db, event_id, ids)
+    return added, removed
+
+
+def event_participant_ids(db: Session, event_id: int) -> list[int]:
+    stmt = (
+        select(event_participant.c.participant_id)
+        .where(event_participant.c.event_id == event_id)
+        .distinct()
+        .order_by(event_participant.c.participant_id)
+    )
+    return list(db.scalars(stmt))
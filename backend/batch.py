@@ -0,0 +1,185 @@
+"""
+Ordered create / update / delete operations on participants, prospects and events, applied in
+the caller's transaction. Each run of consecutive operations of the same kind on the same table
+is one statement (multi-row INSERT, executemany UPDATE by id, DELETE ... WHERE id IN), so
+editing a whole table from the frontend is one round trip and one commit.
+"""
+from itertools import groupby
+from pathlib import Path
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+import jobs
+from config import EVENT_PHOTOS, PHOTOS, UPLOADS
+from models import Event, Participant, Prospect, event_participant, event_speaker
+from schemas import (BatchOperation, EventCreate, EventUpdate, ParticipantCreate, ParticipantUpdate,
+                     ProspectCreate, ProspectUpdate)
+from storage import Storage
+from utils import name_sort_keys, normalize_name
+
+MAX_OPERATIONS = 1000
+
+MODELS = {"participants": Participant, "prospects": Prospect, "events": Event}
+SCHEMAS: dict[tuple[str, str], type[BaseModel]] = {
+    ("participants", "create"): ParticipantCreate,
+    ("participants", "update"): ParticipantUpdate,
+    ("prospects", "create"): ProspectCreate,
+    ("prospects", "update"): ProspectUpdate,
+    ("events", "create"): EventCreate,
+    ("events", "update"): EventUpdate,
+}
+
+
+class BatchError(ValueError):
+    """
+    Operation number `index` can't be applied: the whole batch must be rolled back
+    """
+
+    def __init__(self, index: int, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.index = index
+        self.detail = detail
+        self.status_code = status_code
+
+
+def run(db: Session, operations: list[BatchOperation]) -> tuple[list[dict], list[tuple[Storage, str]]]:
+    """
+    Applies the operations in order, without committing. Returns one result per operation and
+    the files of the deleted rows, to remove once the transaction is committed.
+    Raises BatchError for the first operation that fails.
+    """
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(MAX_OPERATIONS, f"At most {MAX_OPERATIONS} operations per batch")
+
+    # everything is validated before the first write
+    values = [_validate(i, operation) for i, operation in enumerate(operations)]
+
+    results = []
+    files = []
+    runs = groupby(enumerate(operations), key=lambda item: (item[1].op, item[1].table))
+    for (op, table), items in runs:
+        indexes = [i for i, _ in items]
+        model = MODELS[table]
+        if op == "create":
+            ids = _create(db, model, indexes, [values[i] for i in indexes])
+        elif op == "update":
+            ids = [operations[i].id for i in indexes]
+            _update(db, model, indexes, ids, [values[i] for i in indexes])
+        else:
+            ids = [operations[i].id for i in indexes]
+            files.extend(_delete(db, model, indexes, ids))
+        results.extend({"index": i, "op": op, "table": table, "id": id_} for i, id_ in zip(indexes, ids))
+
+    return results, files
+
+
+def _validate(index: int, operation: BatchOperation) -> dict:
+    if operation.op != "create" and operation.id is None:
+        raise BatchError(index, f"{operation.op} needs an id")
+    if operation.op == "delete":
+        return {}
+
+    schema = SCHEMAS[(operation.table, operation.op)]
+    try:
+        data = schema.model_validate(operation.data)
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise BatchError(index, f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+
+    # updates only write the fields given, like the PUT routes
+    values = data.model_dump(exclude_unset=operation.op == "update")
+    if operation.table == "events":
+        # as in update_event, the old HTML goes until render_event runs
+        for field in ("story", "notes"):
+            if field in values:
+                values[f"{field}_html"] = values[f"{field}_html_key"] = None
+    if operation.table == "participants" and "name" in values:
+        # Core statements skip Participant's validator
+        name = values["name"]
+        values["normalized_name"] = normalize_name(name) if name and name.strip() else None
+        values["sort_last_name"], values["sort_first_name"] = name_sort_keys(name)
+    return values
+
+
+def _lock_existing(db: Session, model, indexes: list[int], ids: list[int], *columns) -> dict[int, tuple]:
+    """
+    Row-locks the targeted rows, so they can't go away before commit. Returns id -> columns
+    """
+    rows = db.execute(select(model.id, *columns).where(model.id.in_(set(ids))).with_for_update()).all()
+    found = {row[0]: tuple(row[1:]) for row in rows}
+    for i, id_ in zip(indexes, ids):
+        if id_ not in found:
+            raise BatchError(i, f"{model.__name__} {id_} not found", status_code=404)
+    return found
+
+
+def _check_event_numbers(db: Session, indexes: list[int], ids: list[int | None], rows: list[dict]):
+    """
+    Event.number is unique: report the offending operation rather than the IntegrityError
+    """
+    numbers = [row.get("number") for row in rows]
+    taken = dict(db.execute(
+        select(Event.number, Event.id).where(Event.number.in_({n for n in numbers if n is not None}))
+    ).all())
+    for i, id_, number in zip(indexes, ids, numbers):
+        if number is None:
+            continue
+        if number in taken and taken[number] != id_:
+            raise BatchError(i, "Event number already exists")
+        taken[number] = id_
+
+
+def _render_later(db: Session, ids: list[int], rows: list[dict]):
+    for id_, row in zip(ids, rows):
+        if "story" in row or "notes" in row:
+            jobs.enqueue(db, "render_event", {"event_id": id_}, dedupe_key=f"render_event:{id_}")
+
+
+def _create(db: Session, model, indexes: list[int], rows: list[dict]) -> list[int]:
+    if model is Event:
+        _check_event_numbers(db, indexes, [None] * len(rows), rows)
+
+    # one multi-row INSERT, ids come back in the order of rows
+    ids = list(db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows))
+
+    if model is Event:
+        _render_later(db, ids, rows)
+    return ids
+
+
+def _update(db: Session, model, indexes: list[int], ids: list[int], rows: list[dict]):
+    _lock_existing(db, model, indexes, ids)
+    if model is Event:
+        _check_event_numbers(db, indexes, ids, rows)
+
+    # executemany by primary key, in operation order (the same row may be updated twice)
+    changes = [{"id": id_, **row} for id_, row in zip(ids, rows) if row]
+    if changes:
+        db.execute(update(model), changes)
+
+    if model is Event:
+        _render_later(db, ids, rows)
+
+
+def _delete(db: Session, model, indexes: list[int], ids: list[int]) -> list[tuple[Storage, str]]:
+    files = []
+    if model is Participant:
+        found = _lock_existing(db, model, indexes, ids, Participant.picture_file)
+        files = [(PHOTOS, picture_file) for picture_file, in found.values() if picture_file]
+        db.execute(delete(event_participant).where(event_participant.c.participant_id.in_(found)))
+    elif model is Event:
+        found = _lock_existing(db, model, indexes, ids, Event.script_files, Event.cover_photo)
+        for script_files, cover_photo in found.values():
+            # seeded events may point straight into data/descentes/, only uploads are removed
+            files.extend((UPLOADS, name) for name in script_files or [] if not Path(name).is_absolute())
+            if cover_photo:
+                files.append((EVENT_PHOTOS, cover_photo))
+        db.execute(delete(event_participant).where(event_participant.c.event_id.in_(found)))
+        db.execute(delete(event_speaker).where(event_speaker.c.event_id.in_(found)))
+    else:
+        found = _lock_existing(db, model, indexes, ids)
+
+    db.execute(delete(model).where(model.id.in_(found)))
+    return files
@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Callable, Iterable
+
+
+class TableCache:
+    """
+    In-process cache of values computed from a few tables, e.g. serialized list responses.
+    Entries are dropped when one of their tables changes, as told by changes.Listener.
+
+    Only used while the listener is up: otherwise this process could miss a change made
+    through another one, so every get() computes the value again. Values computed less than
+    settle_seconds after a change to their tables aren't kept either, for reads from a
+    replica that may not have replayed the change yet.
+    """
+
+    def __init__(self, settle_seconds: float = 0):
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[frozenset[str], object]] = {}
+        # bumped on every change, so a value computed across a change is not kept
+        self._versions: dict[str, int] = {}
+        self._changed_at: dict[str, float] = {}
+        self.enabled = False
+
+    def _version(self, tables: frozenset[str]) -> tuple:
+        return tuple(self._versions.get(t, 0) for t in sorted(tables))
+
+    def get(self, key: str, tables: Iterable[str], build: Callable[[], object]):
+        tables = frozenset(tables)
+        with self._lock:
+            if not self.enabled:
+                entry, version = None, None
+            else:
+                entry, version = self._entries.get(key), self._version(tables)
+        if entry is not None:
+            return entry[1]
+
+        value = build()
+        with self._lock:
+            if self.enabled and version is not None and version == self._version(tables) and self._settled(tables):
+                self._entries[key] = (tables, value)
+        return value
+
+    def _settled(self, tables: frozenset[str]) -> bool:
+        changes = [self._changed_at[t] for t in tables if t in self._changed_at]
+        return not changes or time.monotonic() - max(changes) >= self.settle_seconds
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            self._changed_at[table] = time.monotonic()
+            for key, (tables, _) in list(self._entries.items()):
+                if table in tables:
+                    del self._entries[key]
+
+    def enable(self) -> None:
+        # whatever was cached before listening may be stale
+        with self._lock:
+            self._entries.clear()
+            self.enabled = True
+
+    def disable(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.enabled = False
@@ -0,0 +1,86 @@
+"""
+Cross-process change notifications. Triggers (see models.py) NOTIFY on every write to the
+main tables, each API worker process LISTENs and drops what it derived from them.
+"""
+import select as selectors
+import threading
+from typing import Callable
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from db import engine
+from models import CHANGES_CHANNEL
+
+RECONNECT_DELAY = 5
+# how often the listening thread wakes up to check whether it should stop
+POLL_SECONDS = 5
+
+# its own unpooled connection: a LISTENing connection must not be handed to requests,
+# and one dropped by the server is just closed, without a reset
+listen_engine = create_engine(engine.url, poolclass=NullPool, pool_reset_on_return=None)
+
+
+def publish(db: Session, *tables: str) -> None:
+    """
+    For changes the triggers can't see, like a file replaced under the same name.
+    Sent when the caller commits, like the triggers' notifications.
+    """
+    for table in tables:
+        db.execute(select(func.pg_notify(CHANGES_CHANNEL, table)))
+
+
+class Listener:
+    """
+    Holds a dedicated connection LISTENing in a daemon thread. Calls on_change(table) for
+    each notification, on_ready() once listening, and on_lost() when the connection drops:
+    notifications sent until the next on_ready() are missed.
+    """
+
+    def __init__(self, on_change: Callable[[str], None], on_ready: Callable[[], None], on_lost: Callable[[], None]):
+        self.on_change = on_change
+        self.on_ready = on_ready
+        self.on_lost = on_lost
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="changes-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"[changes] listener connection lost: {e}")
+            self.on_lost()
+            self._stop.wait(RECONNECT_DELAY)
+
+    def _listen(self) -> None:
+        raw = listen_engine.raw_connection()
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANGES_CHANNEL}")
+            self.on_ready()
+
+            while not self._stop.is_set():
+                if selectors.select([conn], [], [], POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                tables = set()
+                while conn.notifies:
+                    tables.add(conn.notifies.pop().payload)
+                for table in tables:
+                    self.on_change(table)
+        finally:
+            raw.close()
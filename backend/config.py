@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from storage import make_storage
+
+UPLOAD_DIR = Path("uploads")
+DATA_DIR = Path("data")
+PHOTO_DIR = DATA_DIR / "photos-trombi"
+SPEAKER_PHOTO_DIR = DATA_DIR / "photos-speakers"
+EVENT_PHOTO_DIR = DATA_DIR / "photos-events"
+ALLOWED_PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
+
+# where the files above actually live, see storage.py:
+# - local: in those directories (shared volume between containers)
+# - s3: in S3_BUCKET under uploads/, photos-trombi/, photos-speakers/, photos-events/.
+#   S3_ENDPOINT_URL for MinIO or another S3-compatible server, credentials from AWS_* variables.
+#   S3_PUBLIC_ENDPOINT_URL if browsers reach it under another address (presigned download URLs)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local")
+S3_BUCKET = os.environ.get("S3_BUCKET")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_PUBLIC_ENDPOINT_URL = os.environ.get("S3_PUBLIC_ENDPOINT_URL")
+S3 = (S3_BUCKET, S3_ENDPOINT_URL, S3_PUBLIC_ENDPOINT_URL)
+
+UPLOADS = make_storage(STORAGE_BACKEND, "uploads", UPLOAD_DIR, *S3)
+PHOTOS = make_storage(STORAGE_BACKEND, "photos-trombi", PHOTO_DIR, *S3)
+SPEAKER_PHOTOS = make_storage(STORAGE_BACKEND, "photos-speakers", SPEAKER_PHOTO_DIR, *S3)
+EVENT_PHOTOS = make_storage(STORAGE_BACKEND, "photos-events", EVENT_PHOTO_DIR, *S3)
+
+# key prefix in UPLOADS for uploads waiting for a background job (e.g. event zips)
+JOB_STAGING_PREFIX = ".jobs/"
+
+# how files are sent to clients, see file_serving.py:
+# - direct: FileResponse from the Python worker (dev default)
+# - x-accel: X-Accel-Redirect to an internal nginx location, nginx streams the file
+# - x-sendfile: X-Sendfile with the absolute path (Apache, lighttpd, ...)
+FILE_SERVING = os.environ.get("FILE_SERVING", "direct")
+# internal location nginx maps onto FILE_SERVING_ROOT
+X_ACCEL_PREFIX = os.environ.get("X_ACCEL_PREFIX", "/_protected/")
+# directory files are served relative to, the backend's /app in docker
+FILE_SERVING_ROOT = Path(os.path.abspath(os.environ.get("FILE_SERVING_ROOT", ".")))
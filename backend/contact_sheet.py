@@ -0,0 +1,107 @@
+"""
+Contact sheets: the photos of all participants (or speakers) as thumbnails in one image, plus
+where each one is, so a grid of faces is two requests instead of one per person.
+
+Thumbnails are kept in memory per (storage, key) along with the file's version (size, mtime):
+rebuilding a sheet after a change only decodes the photos that changed.
+"""
+import hashlib
+import io
+import json
+import threading
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+from storage import Storage
+
+# pixels, about twice the size the pages show them at
+TILE_SIZE = 96
+COLUMNS = 16
+JPEG_QUALITY = 80
+
+
+@dataclass
+class Sheet:
+    image: bytes  # JPEG
+    tile_size: int
+    etag: str  # of the image and the tiles together
+    width: int
+    height: int
+    tiles: dict[int, tuple[int, int]]  # id -> top left corner of its tile
+
+
+_lock = threading.Lock()
+# (storage, key, tile size) -> (version, thumbnail or None if unreadable)
+_thumbs: dict[tuple[str, str, int], tuple[tuple[int, float], Image.Image | None]] = {}
+
+
+def _thumbnail(storage: Storage, key: str, tile_size: int) -> Image.Image:
+    with storage.open(key) as f:
+        # S3 bodies can't seek, and photos are small
+        img = Image.open(io.BytesIO(f.read()))
+    # JPEGs decode straight at a fraction of their size, much faster than full size
+    img.draft("RGB", (tile_size * 2, tile_size * 2))
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    # faces sit a bit above the middle
+    return ImageOps.fit(img, (tile_size, tile_size), Image.Resampling.LANCZOS, centering=(0.5, 0.4))
+
+
+def _thumbnails(storage: Storage, pictures: list[tuple[int, str]], tile_size: int) -> list[tuple[int, Image.Image]]:
+    """
+    (id, thumbnail) for the pictures that exist and can be read, in order
+    """
+    versions = storage.versions(key for _, key in pictures)
+    out = []
+    for id_, key in pictures:
+        version = versions.get(key)
+        if version is None:
+            continue
+
+        cache_key = (str(storage), key, tile_size)
+        with _lock:
+            cached = _thumbs.get(cache_key)
+        if cached is not None and cached[0] == version:
+            thumb = cached[1]
+        else:
+            try:
+                thumb = _thumbnail(storage, key, tile_size)
+            except (OSError, Image.DecompressionBombError):
+                # not an image after all: no tile, the grid shows a placeholder as for no picture
+                thumb = None
+            with _lock:
+                _thumbs[cache_key] = (version, thumb)
+        if thumb is not None:
+            out.append((id_, thumb))
+
+    # forget the photos nobody points to anymore
+    used = {(str(storage), key, tile_size) for _, key in pictures}
+    with _lock:
+        for cache_key in [k for k in _thumbs if k[0] == str(storage) and k[2] == tile_size and k not in used]:
+            del _thumbs[cache_key]
+    return out
+
+
+def build(storage: Storage, pictures: list[tuple[int, str]], tile_size: int = TILE_SIZE) -> Sheet:
+    """
+    Sheet of the (id, picture key) pictures, tiles left to right then top to bottom in that order
+    """
+    thumbs = _thumbnails(storage, pictures, tile_size)
+
+    columns = max(1, min(COLUMNS, len(thumbs)))
+    rows = max(1, -(-len(thumbs) // COLUMNS))
+    sheet = Image.new("RGB", (columns * tile_size, rows * tile_size), "white")
+    tiles = {}
+    for n, (id_, thumb) in enumerate(thumbs):
+        corner = ((n % COLUMNS) * tile_size, (n // COLUMNS) * tile_size)
+        sheet.paste(thumb, corner)
+        tiles[id_] = corner
+
+    buf = io.BytesIO()
+    sheet.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    image = buf.getvalue()
+
+    digest = hashlib.sha256(image)
+    digest.update(json.dumps(tiles).encode())
+    return Sheet(image=image, tile_size=tile_size, etag=digest.hexdigest()[:32], width=sheet.width, height=sheet.height,
+                 tiles=tiles)
@@ -0,0 +1,243 @@
+import csv
+import re
+from pathlib import Path
+from typing import Iterable
+
+from sqlalchemy import Integer, bindparam, insert, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models import Participant, Prospect
+from utils import name_sort_keys, normalize_name
+
+BATCH_SIZE = 500
+
+# link (participant id, event number) pairs in one statement, skipping unknown
+# event numbers and links that already exist
+LINK_PARTICIPANTS_SQL = text("""
+    INSERT INTO event_participant (event_id, participant_id)
+    SELECT DISTINCT e.id, v.participant_id
+    FROM unnest(:participant_ids, :event_numbers) AS v(participant_id, event_number)
+    JOIN events e ON e.number = v.event_number
+    WHERE NOT EXISTS (
+        SELECT 1 FROM event_participant ep
+        WHERE ep.event_id = e.id AND ep.participant_id = v.participant_id
+    )
+    RETURNING event_id, participant_id
+""").bindparams(
+    bindparam("participant_ids", type_=ARRAY(Integer)),
+    bindparam("event_numbers", type_=ARRAY(Integer)),
+)
+
+
+def new_report() -> dict:
+    return {"rows": 0, "created": 0, "updated": 0, "duplicates": 0, "skipped": 0, "links": 0, "errors": []}
+
+
+def parse_event_numbers(value: str) -> list[int]:
+    """
+    "1, 4,12" -> [1, 4, 12]
+    """
+    return [int(x.strip()) for x in value.split(',') if x.strip()]
+
+
+# strip *...*
+def norm_cell(h: str | None) -> str:
+    h = (h or "").strip()
+    h = re.sub(r"^\*+|\*+$", "", h)
+    return h
+
+
+def check_columns(reader: csv.DictReader, *columns: str):
+    """
+    Raises ValueError naming the first column missing from the header: without it every row would be skipped
+    """
+    for column in columns:
+        if column not in (reader.fieldnames or []):
+            raise ValueError(f"Missing column: {column}")
+
+
+def prospect_reader(f) -> csv.DictReader:
+    reader = csv.DictReader(f)
+    reader.fieldnames = [norm_cell(h) for h in (reader.fieldnames or [])]
+    return reader
+
+
+# ------- PARTICIPANTS -------
+def import_participants(db: Session, rows: Iterable[dict], photo_index: dict[str, Path] | None = None) -> dict:
+    """
+    Upserts participants from rows of participants-participantes.csv, deduped on normalized name.
+    Rows are consumed lazily and written in batches of BATCH_SIZE, so any iterable
+    (e.g. a csv.DictReader over an upload) works without loading the whole file.
+    Does not commit.
+    """
+    report = new_report()
+    seen: set[str] = set()
+    batch: dict[str, dict] = {}
+
+    # line 1 is the header
+    for line_no, row in enumerate(rows, start=2):
+        report["rows"] += 1
+        name = (row.get('État civil') or "").strip()
+        if not name:
+            report["skipped"] += 1
+            continue
+
+        try:
+            event_numbers = parse_event_numbers(row.get('Descentes') or "")
+        except ValueError:
+            report["errors"].append({"line": line_no, "detail": "Invalid event numbers"})
+            report["skipped"] += 1
+            continue
+
+        normalized_name = normalize_name(name)
+        if normalized_name in seen:
+            # same person twice in the file: keep the first row, merge event links
+            report["duplicates"] += 1
+            if normalized_name in batch:
+                batch[normalized_name]["event_numbers"].extend(event_numbers)
+            else:
+                batch[normalized_name] = {"event_numbers": event_numbers, "link_only": True}
+            continue
+        seen.add(normalized_name)
+
+        picture_filepath = photo_index.get(normalized_name) if photo_index else None
+        # Core inserts/updates skip Participant's validator, sort keys are set here
+        sort_last_name, sort_first_name = name_sort_keys(name)
+        batch[normalized_name] = {
+            "values": {
+                "name": name,
+                "normalized_name": normalized_name,
+                "ktaname": (row.get('Pseudo') or "").strip(),
+                "note": (row.get('Relation aux ordanisateurs') or "").strip(),
+                "is_plusone": (row.get("Est un +1 de l'orateur") or "").strip() == "1",
+                "picture_file": (picture_filepath.name if picture_filepath else None),
+                "sort_last_name": sort_last_name,
+                "sort_first_name": sort_first_name,
+            },
+            "event_numbers": event_numbers,
+        }
+
+        if len(batch) >= BATCH_SIZE:
+            _flush_participants(db, batch, report)
+            batch = {}
+
+    if batch:
+        _flush_participants(db, batch, report)
+
+    return report
+
+
+def _flush_participants(db: Session, batch: dict[str, dict], report: dict) -> None:
+    names = list(batch.keys())
+    ids_by_name = dict(
+        db.execute(
+            select(Participant.normalized_name, Participant.id)
+            .where(Participant.normalized_name.in_(names))
+        ).all()
+    )
+
+    to_insert = []
+    to_update = []
+    for normalized_name, entry in batch.items():
+        if entry.get("link_only"):
+            continue
+        values = entry["values"]
+        pid = ids_by_name.get(normalized_name)
+        if pid is None:
+            to_insert.append(values)
+        else:
+            # never drop an existing picture because the photo index has none
+            changes = {k: v for k, v in values.items() if not (k == "picture_file" and v is None)}
+            to_update.append({"id": pid, **changes})
+
+    if to_insert:
+        created = db.execute(
+            insert(Participant).values(to_insert).returning(Participant.normalized_name, Participant.id)
+        ).all()
+        ids_by_name.update(dict(created))
+        report["created"] += len(created)
+
+    if to_update:
+        db.execute(update(Participant), to_update)
+        report["updated"] += len(to_update)
+
+    participant_ids, event_numbers = [], []
+    for normalized_name, entry in batch.items():
+        pid = ids_by_name.get(normalized_name)
+        if pid is None:
+            continue
+        for number in entry["event_numbers"]:
+            participant_ids.append(pid)
+            event_numbers.append(number)
+
+    if participant_ids:
+        linked = db.execute(
+            LINK_PARTICIPANTS_SQL,
+            {"participant_ids": participant_ids, "event_numbers": event_numbers},
+        ).all()
+        report["links"] += len(linked)
+
+
+# ------- PROSPECTS -------
+def import_prospects(db: Session, rows: Iterable[dict]) -> dict:
+    """
+    Upserts prospects from rows of orateurs-oratrices-potentiels.csv (see prospect_reader
+    for the *...* headers), deduped on normalize_name(name). Does not commit.
+    """
+    report = new_report()
+
+    # prospects have no normalized column, the table is small enough to index in one query
+    ids_by_name: dict[str, int] = {}
+    for pid, name in db.execute(select(Prospect.id, Prospect.name)):
+        if name:
+            ids_by_name.setdefault(normalize_name(name), pid)
+
+    seen: set[str] = set()
+    to_insert: list[dict] = []
+    to_update: list[dict] = []
+
+    for row in rows:
+        report["rows"] += 1
+        name = norm_cell(row.get("Orateur/Oratrice"))
+        if not name:
+            report["skipped"] += 1
+            continue
+
+        normalized_name = normalize_name(name)
+        if normalized_name in seen:
+            report["duplicates"] += 1
+            continue
+        seen.add(normalized_name)
+
+        values = {
+            "name": name,
+            "approached": row.get("Approché.e"),
+            "response": row.get("Réponse"),
+            "domain": row.get("Domaine"),
+            "suggested_by": row.get("Suggéré par"),
+            "remarks": row.get("Remarques"),
+        }
+        pid = ids_by_name.get(normalized_name)
+        if pid is None:
+            to_insert.append(values)
+        else:
+            to_update.append({"id": pid, **values})
+
+        if len(to_insert) >= BATCH_SIZE:
+            db.execute(insert(Prospect).values(to_insert))
+            report["created"] += len(to_insert)
+            to_insert = []
+        if len(to_update) >= BATCH_SIZE:
+            db.execute(update(Prospect), to_update)
+            report["updated"] += len(to_update)
+            to_update = []
+
+    if to_insert:
+        db.execute(insert(Prospect).values(to_insert))
+        report["created"] += len(to_insert)
+    if to_update:
+        db.execute(update(Prospect), to_update)
+        report["updated"] += len(to_update)
+
+    return report
@@ -3,8 +3,18 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.environ["DATABASE_URL"]
+# optional streaming replica, for reads that can be a little behind (see ReadSessionLocal)
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+# how far behind the replica may be: clients that just wrote read from the primary for this long
+REPLICA_LAG_SECONDS = float(os.environ.get("REPLICA_LAG_SECONDS", "5"))
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 
+replica_engine = None
+if DATABASE_REPLICA_URL:
+    replica_engine = create_engine(DATABASE_REPLICA_URL, execution_options={"postgresql_readonly": True})
+# read-only work: the replica when there is one, else the primary
+ReadSessionLocal = sessionmaker(bind=replica_engine or engine)
+
 Base = declarative_base()
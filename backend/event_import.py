@@ -0,0 +1,216 @@
+import uuid
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO
+
+from sqlalchemy.orm import Session
+
+from models import Event, Speaker
+from render import render_event_texts
+from storage import Storage
+from utils import normalize_name, parse_event_date, parse_event_info
+
+ALLOWED_PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
+MAX_UNCOMPRESSED_SIZE = 512 * 1024 * 1024
+
+
+def _aside(key: str, suffix: str) -> str:
+    path = PurePosixPath(key)
+    return str(path.with_name(f".{path.name}.{uuid.uuid4().hex}.{suffix}"))
+
+
+class StagedFiles:
+    """
+    Files are first extracted next to their final location under a temporary name,
+    then moved in place only once the DB rows are flushed. Replaced files are kept
+    aside until the commit so a failure can put everything back as it was.
+    """
+
+    def __init__(self):
+        self.staged: list[tuple[Storage, str, str]] = []    # (storage, tmp, final)
+        self.placed: list[tuple[Storage, str, str | None]] = []  # (storage, final, backup)
+
+    def stage(self, src: BinaryIO, storage: Storage, final: str) -> None:
+        tmp = _aside(final, "part")
+        self.staged.append((storage, tmp, final))
+        storage.save(tmp, src)
+
+    def place(self) -> None:
+        for storage, tmp, final in self.staged:
+            backup = None
+            if storage.exists(final):
+                backup = _aside(final, "bak")
+                storage.move(final, backup)
+            storage.move(tmp, final)
+            self.placed.append((storage, final, backup))
+        self.staged = []
+
+    def rollback(self) -> None:
+        for storage, tmp, _ in self.staged:
+            storage.delete(tmp)
+        for storage, final, backup in reversed(self.placed):
+            storage.delete(final)
+            if backup is not None:
+                storage.move(backup, final)
+        self.staged, self.placed = [], []
+
+    def cleanup(self) -> None:
+        for storage, _, backup in self.placed:
+            if backup is not None:
+                storage.delete(backup)
+        self.placed = []
+
+
+def _entries(zf: zipfile.ZipFile) -> tuple[str, dict[str, zipfile.ZipInfo]]:
+    """
+    Returns the event folder name ("" if none) and the archive entries by path inside it. The archive can either
+    have the event files at its root or inside a single NN-xxx/ folder, like data/descentes/.
+    """
+    files = [
+        info for info in zf.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not PurePosixPath(info.filename).name.startswith(".")
+    ]
+
+    if sum(info.file_size for info in files) > MAX_UNCOMPRESSED_SIZE:
+        raise ValueError("Archive too large once extracted")
+
+    paths = {PurePosixPath(info.filename): info for info in files}
+    for path in paths:
+        if path.is_absolute() or ".." in path.parts:
+            raise ValueError(f"Invalid path in archive: {path}")
+
+    roots = {path.parts[0] for path in paths}
+    prefix = ""
+    if len(roots) == 1 and all(len(path.parts) > 1 for path in paths):
+        prefix = roots.pop()
+
+    entries = {}
+    for path, info in paths.items():
+        entries["/".join(path.parts[1:] if prefix else path.parts)] = info
+    return prefix, entries
+
+
+def _read_text(zf: zipfile.ZipFile, info: zipfile.ZipInfo | None) -> str | None:
+    if info is None:
+        return None
+    return zf.read(info).decode("utf-8", errors="replace")
+
+
+def _find_photo(entries: dict, stems: set[str]) -> zipfile.ZipInfo | None:
+    for name, info in entries.items():
+        path = PurePosixPath(name)
+        if len(path.parts) == 1 and path.stem.lower() in stems and path.suffix.lower() in ALLOWED_PHOTO_EXTS:
+            return info
+    return None
+
+
+def import_event_zip(
+    db: Session,
+    archive: BinaryIO,
+    uploads: Storage,
+    speaker_photos: Storage,
+    event_photos: Storage,
+    number: int | None = None,
+) -> Event:
+    """
+    Creates an event, its speaker and files from a zip laid out like a data/descentes/NN-xxx/ folder:
+
+    NN-xxx/
+    ├── info            # same format as for seed.py
+    ├── recit.md        # optional
+    ├── notes.md        # optional
+    ├── script/         # optional, any number of files
+    ├── cover.jpg       # optional, or NN_title.jpg
+    └── speaker.jpg     # optional, or orateur.jpg
+
+    Entries are streamed from the archive to their final location. Everything happens in the
+    session's transaction: on any error files are removed again, and the session is left for
+    the caller to roll back. Commits on success. Raises ValueError for malformed archives.
+    """
+    try:
+        zf = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a zip file")
+
+    with zf:
+        folder, entries = _entries(zf)
+
+        if "info" not in entries:
+            raise ValueError("Missing info file")
+        info = parse_event_info(_read_text(zf, entries["info"]).splitlines())
+
+        if number is None:
+            try:
+                number = int(folder.split('-')[0])
+            except ValueError:
+                raise ValueError("No event number (name the folder NN-xxx or give it explicitly)")
+
+        for key in ("Titre", "Date", "Orateur"):
+            if not info.get(key):
+                raise ValueError(f"Missing {key} in info file")
+        try:
+            date = parse_event_date(info["Date"])
+        except ValueError:
+            raise ValueError("Invalid Date in info file (expected dd-mm-yyyy)")
+
+        if db.query(Event).filter(Event.number == number).first():
+            raise ValueError("Event number already exists")
+
+        files = StagedFiles()
+        try:
+            script_files = []
+            for name in sorted(entries):
+                if not name.startswith("script/"):
+                    continue
+                stored_name = f"{uuid.uuid4().hex}{PurePosixPath(name).suffix.lower()}"
+                with zf.open(entries[name]) as src:
+                    files.stage(src, uploads, stored_name)
+                script_files.append(stored_name)
+
+            speaker = Speaker(
+                name=info["Orateur"].strip(),
+                ktaname=info.get("Pseudo") or None,
+                labo=info.get("Labo") or None,
+                picture_file=None,
+            )
+            speaker_photo = _find_photo(entries, {"speaker", "orateur"})
+            if speaker_photo is not None:
+                filename = f"{normalize_name(speaker.name)}{PurePosixPath(speaker_photo.filename).suffix.lower()}"
+                with zf.open(speaker_photo) as src:
+                    files.stage(src, speaker_photos, filename)
+                speaker.picture_file = filename
+
+            cover_photo = None
+            cover = _find_photo(entries, {"cover", f"{number}_title"})
+            if cover is not None:
+                cover_photo = f"{number}/{number}_title{PurePosixPath(cover.filename).suffix.lower()}"
+                with zf.open(cover) as src:
+                    files.stage(src, event_photos, cover_photo)
+
+            ev = Event(
+                number=number,
+                title=info["Titre"],
+                date=date,
+                story=_read_text(zf, entries.get("recit.md")),
+                notes=_read_text(zf, entries.get("notes.md")),
+                cover_photo=cover_photo,
+                script_files=(script_files or None),
+                speaker=[speaker],
+            )
+            render_event_texts(ev)
+            db.add(speaker)
+            db.add(ev)
+            db.flush()
+
+            files.place()
+            db.commit()
+        except BaseException:
+            files.rollback()
+            raise
+
+        files.cleanup()
+
+    db.refresh(ev)
+    return ev
@@ -0,0 +1,215 @@
+import csv
+import datetime
+import io
+import json
+import re
+import unicodedata
+from pathlib import PurePosixPath
+from typing import Iterable, Iterator
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session, selectinload
+
+from db import ReadSessionLocal
+from models import Event, Participant, Prospect, Speaker, event_participant, event_speaker
+from storage import Storage
+from utils import normalize_name, photo_filename_stem
+from zipstream import iter_zip
+
+# rows fetched per round trip from the server-side cursor
+YIELD_PER = 1000
+# output lines per chunk handed to the response
+LINES_PER_CHUNK = 500
+
+PARTICIPANTS_CSV_HEADER = ["État civil", "Pseudo", "Relation aux ordanisateurs", "Est un +1 de l'orateur", "Descentes"]
+PROSPECTS_CSV_HEADER = ["Orateur/Oratrice", "Approché.e", "Réponse", "Domaine", "Suggéré par", "Remarques"]
+
+
+def event_numbers_query(association, key_column, owner_id) -> Select:
+    """
+    Correlated subquery: sorted event numbers the owner (speaker or participant) is linked to
+    """
+    number = Event.number
+    return (
+        select(func.array_agg(aggregate_order_by(number.distinct(), number)))
+        .select_from(association.join(Event, Event.id == association.c.event_id))
+        .where(key_column == owner_id)
+        .scalar_subquery()
+    )
+
+
+def table_query(table: str) -> Select:
+    if table == "events":
+        return select(Event.__table__).order_by(Event.number)
+    if table == "speakers":
+        event_numbers = event_numbers_query(event_speaker, event_speaker.c.speaker_id, Speaker.id)
+        return select(Speaker.__table__, event_numbers.label("event_numbers")).order_by(Speaker.id)
+    if table == "participants":
+        event_numbers = event_numbers_query(event_participant, event_participant.c.participant_id, Participant.id)
+        return select(Participant.__table__, event_numbers.label("event_numbers")).order_by(Participant.id)
+    if table == "prospects":
+        return select(Prospect.__table__).order_by(Prospect.id)
+    if table == "event_participant":
+        return select(event_participant).order_by(event_participant.c.event_id, event_participant.c.participant_id)
+    if table == "event_speaker":
+        return select(event_speaker).order_by(event_speaker.c.event_id, event_speaker.c.speaker_id)
+    raise KeyError(table)
+
+
+TABLES = ["events", "speakers", "participants", "prospects", "event_participant", "event_speaker"]
+
+
+def stream_rows(db: Session, stmt: Select) -> Iterator[dict]:
+    """
+    Iterates over a server-side cursor (yield_per implies stream_results), so memory
+    stays constant whatever the table size
+    """
+    result = db.execute(stmt.execution_options(yield_per=YIELD_PER))
+    for row in result.mappings():
+        yield dict(row)
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[bytes]:
+    buf = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= LINES_PER_CHUNK:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value)}")
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _csv_cell(value):
+    if isinstance(value, list):
+        return ",".join(str(v) for v in value)
+    if value is None:
+        return ""
+    return value
+
+
+def csv_lines(header: list[str], rows: Iterable[list]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_csv_cell(v) for v in row])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_table(table: str, fmt: str) -> Iterator[bytes]:
+    """
+    Whole table as NDJSON or CSV. Opens its own session since it outlives the request handler,
+    on the replica if there is one.
+    """
+    stmt = table_query(table)
+    db = ReadSessionLocal()
+    try:
+        rows = stream_rows(db, stmt)
+        if fmt == "csv":
+            header = [c.name for c in stmt.selected_columns]
+            yield from _chunked(csv_lines(header, (list(row.values()) for row in rows)))
+        else:
+            yield from _chunked(ndjson_lines(rows))
+    finally:
+        db.close()
+
+
+# ------- data/ folder layout, as read by seed.py -------
+def slugify(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-")[:40] or "descente"
+
+
+def event_info(ev: Event) -> bytes:
+    speaker = ev.speaker[0] if ev.speaker else None
+    lines = [
+        f"Titre {ev.title or ''}",
+        f"Date {ev.date.strftime('%d-%m-%Y') if ev.date else ''}",
+        f"Orateur {speaker.name if speaker else ''}",
+        f"Pseudo {(speaker.ktaname or '') if speaker else ''}",
+        f"Labo {(speaker.labo or '') if speaker else ''}",
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _data_entries(db: Session, uploads: Storage, photos: Storage, speaker_photos: Storage,
+                  event_photos: Storage) -> Iterator[tuple]:
+    # events, one folder each. Events are few but their files are big: files are
+    # streamed from disk one after the other
+    events = select(Event).options(selectinload(Event.speaker)).order_by(Event.number)
+    for ev in db.scalars(events.execution_options(yield_per=YIELD_PER)):
+        folder = f"descentes/{ev.number:02d}-{slugify(ev.title or '')}"
+        yield f"{folder}/info", event_info(ev)
+        if ev.story:
+            yield f"{folder}/recit.md", ev.story.encode("utf-8")
+        if ev.notes:
+            yield f"{folder}/notes.md", ev.notes.encode("utf-8")
+        for stored_name in ev.script_files or []:
+            if uploads.exists(stored_name):
+                yield f"{folder}/script/{PurePosixPath(stored_name).name}", uploads.content(stored_name)
+        if ev.cover_photo and event_photos.exists(ev.cover_photo):
+            yield f"photos-events/{ev.cover_photo}", event_photos.content(ev.cover_photo)
+        for speaker in ev.speaker:
+            if speaker.picture_file and speaker_photos.exists(speaker.picture_file):
+                yield f"photos-speakers/{speaker.picture_file}", speaker_photos.content(speaker.picture_file)
+
+    # participant photos, renamed the way seed.py matches them
+    pictures = select(Participant.name, Participant.normalized_name, Participant.picture_file)
+    for p in stream_rows(db, pictures.where(Participant.picture_file.is_not(None))):
+        key = p["picture_file"]
+        slug = p["normalized_name"] or normalize_name(p["name"] or "")
+        if slug and photos.exists(key):
+            yield f"photos-trombi/{photo_filename_stem(slug)}{PurePosixPath(key).suffix.lower()}", photos.content(key)
+
+    participants = stream_rows(db, table_query("participants"))
+    yield "participants-participantes.csv", _chunked(csv_lines(PARTICIPANTS_CSV_HEADER, (
+        [p["name"], p["ktaname"], p["note"], "1" if p["is_plusone"] else "0", p["event_numbers"] or []]
+        for p in participants
+    )))
+
+    prospects = stream_rows(db, table_query("prospects"))
+    yield "orateurs-oratrices-potentiels.csv", _chunked(csv_lines(PROSPECTS_CSV_HEADER, (
+        [p["name"], p["approached"], p["response"], p["domain"], p["suggested_by"], p["remarks"]]
+        for p in prospects
+    )))
+
+
+def _unique_names(entries: Iterable[tuple]) -> Iterator[tuple]:
+    """
+    First entry of each name only: speakers can share a photo, people a normalized name, and
+    unzip tools reject or overwrite duplicate members. Skipped contents are never read.
+    """
+    seen = set()
+    for entry in entries:
+        if entry[0] in seen:
+            continue
+        seen.add(entry[0])
+        yield entry
+
+
+def iter_data_zip(uploads: Storage, photos: Storage, speaker_photos: Storage, event_photos: Storage) -> Iterator[bytes]:
+    """
+    Zip of a data/ folder that seed.py can consume as-is
+    """
+    db = ReadSessionLocal()
+    try:
+        yield from iter_zip(_unique_names(_data_entries(db, uploads, photos, speaker_photos, event_photos)))
+    finally:
+        db.close()
@@ -0,0 +1,51 @@
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from config import FILE_SERVING, FILE_SERVING_ROOT, X_ACCEL_PREFIX
+from storage import Storage
+
+
+def _offload_headers(path: Path, filename: str | None) -> dict[str, str]:
+    headers = {}
+    media_type, _ = mimetypes.guess_type(filename or path.name)
+    if media_type:
+        headers["Content-Type"] = media_type
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    return headers
+
+
+def serve_file(storage: Storage, key: str, filename: str | None = None,
+               missing_detail: str = "File missing on disk") -> Response:
+    """
+    Sends a file the routes already looked up and authorized.
+
+    Remote storages redirect the client to a presigned URL, it downloads from there directly.
+    Local files: in direct mode the Python worker streams them. In offload modes the response only
+    carries a header telling the reverse proxy which file to send: no stat, no bytes through Python,
+    and the proxy deals with Range and caching headers. A missing file is then the proxy's 404.
+    """
+    path = storage.local_path(key)
+    if path is None:
+        # not checking existence either: the storage answers 404 itself
+        return RedirectResponse(storage.url(key, filename), status_code=307)
+
+    abs_path = Path(os.path.abspath(path))
+    # files outside the root aren't reachable from the proxy's internal location
+    if FILE_SERVING == "x-accel" and abs_path.is_relative_to(FILE_SERVING_ROOT):
+        location = X_ACCEL_PREFIX + quote(abs_path.relative_to(FILE_SERVING_ROOT).as_posix())
+        return Response(headers={"X-Accel-Redirect": location, **_offload_headers(path, filename)})
+
+    if FILE_SERVING == "x-sendfile":
+        return Response(headers={"X-Sendfile": str(abs_path), **_offload_headers(path, filename)})
+
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=missing_detail)
+
+    # FileResponse answers Range requests itself (206 / 416), for large PDFs
+    return FileResponse(path=str(path), filename=filename)
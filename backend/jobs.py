@@ -0,0 +1,222 @@
+import datetime
+import random
+import threading
+import traceback
+from typing import Any, Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from db import SessionLocal
+from models import Job
+
+# a running job whose worker hasn't reported back after this long is considered dead.
+# Workers renew the lease every HEARTBEAT while the handler runs, however long it takes
+LEASE = datetime.timedelta(minutes=15)
+HEARTBEAT = LEASE / 5
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+
+# kind -> handler(db, payload) -> json-serializable result
+HANDLERS: dict[str, Callable[[Session, dict], Any]] = {}
+
+
+class PermanentError(Exception):
+    """
+    Raised by a handler when retrying cannot help (bad input): the job fails right away
+    """
+
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict | None = None,
+    delay: float = 0,
+    dedupe_key: str | None = None,
+    max_attempts: int = 5,
+) -> int:
+    """
+    Adds a job in the caller's transaction: it only becomes visible to workers when the
+    data it is about is committed too. With a dedupe_key, a job already queued under
+    that key is reused instead. Returns the job id.
+    """
+    stmt = (
+        insert(Job)
+        .values(
+            kind=kind,
+            payload=payload or {},
+            run_after=func.now() + datetime.timedelta(seconds=delay),
+            dedupe_key=dedupe_key,
+            max_attempts=max_attempts,
+        )
+        .on_conflict_do_nothing(
+            index_elements=[Job.dedupe_key],
+            index_where=(Job.status == "queued") & Job.dedupe_key.is_not(None),
+        )
+        .returning(Job.id)
+    )
+    job_id = db.scalar(stmt)
+    if job_id is None:
+        job_id = db.scalar(select(Job.id).where(Job.status == "queued", Job.dedupe_key == dedupe_key))
+    return job_id
+
+
+def enqueue_periodic(db: Session, kind: str, every: datetime.timedelta, payload: dict | None = None) -> int | None:
+    """
+    Enqueues kind unless a job of that kind was created less than `every` ago.
+    Returns the new job id, or None if it's not time yet.
+    """
+    recent = db.scalar(select(Job.id).where(Job.kind == kind, Job.created_at > func.now() - every).limit(1))
+    if recent is not None:
+        return None
+    return enqueue(db, kind, payload, dedupe_key=f"periodic:{kind}")
+
+
+def claim(db: Session) -> Job | None:
+    """
+    Takes the next due job, skipping the ones other workers are claiming at the same
+    time (FOR UPDATE SKIP LOCKED), and marks it running. Commits.
+    """
+    next_job = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_after <= func.now())
+        .order_by(Job.run_after, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job = db.scalar(
+        update(Job)
+        .where(Job.id == next_job)
+        .values(status="running", attempts=Job.attempts + 1, locked_at=func.now())
+        .returning(Job)
+    )
+    db.commit()
+    return job
+
+
+def backoff(attempts: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(1, 1.2)
+
+
+def run(db: Session, job: Job) -> None:
+    """
+    Runs a claimed job with its handler and records the outcome. Failed jobs are
+    queued again with exponential backoff until max_attempts.
+    """
+    job_id, kind, payload = job.id, job.kind, job.payload
+    attempts, max_attempts = job.attempts, job.max_attempts
+    # this claim of the job: once reaped (or reaped and claimed again), the outcome isn't ours to write
+    claimed = (Job.id == job_id) & (Job.status == "running") & (Job.attempts == attempts) & Job.locked_at.is_not(None)
+
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(claimed, done), name=f"heartbeat-{job_id}", daemon=True)
+    heartbeat.start()
+    try:
+        fn = HANDLERS.get(kind)
+        if fn is None:
+            raise PermanentError(f"No handler for job kind {kind!r}")
+        result = fn(db, payload)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        error = "".join(traceback.format_exception_only(e)).strip()
+        failed = {"status": "failed", "last_error": error, "locked_at": None, "finished_at": func.now()}
+        if isinstance(e, PermanentError) or attempts >= max_attempts:
+            db.execute(update(Job).where(claimed).values(**failed))
+        else:
+            run_after = func.now() + datetime.timedelta(seconds=backoff(attempts))
+            retried = db.execute(
+                update(Job)
+                .where(claimed, ~_queued_twin_exists())
+                .values(status="queued", run_after=run_after, last_error=error, locked_at=None)
+            )
+            if retried.rowcount == 0:
+                # an identical job got queued meanwhile, it will do the work
+                db.execute(update(Job).where(claimed).values(**failed))
+        db.commit()
+        print(f"[jobs] {kind} #{job_id} failed (attempt {attempts}/{max_attempts}): {error}")
+        return
+    finally:
+        done.set()
+        heartbeat.join()
+
+    db.execute(
+        update(Job)
+        .where(claimed)
+        .values(status="succeeded", result=result, locked_at=None, finished_at=func.now())
+    )
+    db.commit()
+
+
+def _heartbeat(claimed, done: threading.Event) -> None:
+    """
+    Renews the lease of a running job until done is set, on its own connection: the
+    handler's transaction may stay open for the whole run
+    """
+    while not done.wait(HEARTBEAT.total_seconds()):
+        db = SessionLocal()
+        try:
+            db.execute(update(Job).where(claimed).values(locked_at=func.now()))
+            db.commit()
+        except Exception as e:
+            # next beat may get through, the lease leaves room for a few misses
+            print(f"[jobs] heartbeat failed: {e!r}")
+        finally:
+            db.close()
+
+
+def _queued_twin_exists():
+    """
+    For UPDATEs on jobs: whether another job with the same dedupe key is queued
+    """
+    twin = aliased(Job)
+    return (
+        select(twin.id)
+        .where(twin.dedupe_key == Job.dedupe_key, twin.status == "queued", twin.id != Job.id)
+        .exists()
+    )
+
+
+def requeue_stale(db: Session) -> int:
+    """
+    Puts back jobs whose worker died mid-run, unless they used up their attempts (a job that
+    kills its worker would loop forever). Of several stale jobs sharing a dedupe key, only the
+    oldest is queued again, the partial unique index allows one. The rest fail. Returns how many
+    were requeued.
+    """
+    stale = (Job.status == "running") & (Job.locked_at < func.now() - LEASE)
+    retryable = stale & (Job.attempts < Job.max_attempts)
+
+    twin = aliased(Job)
+    oldest_of_key = (
+        select(func.min(twin.id))
+        .where(
+            twin.dedupe_key == Job.dedupe_key,
+            twin.status == "running",
+            twin.locked_at < func.now() - LEASE,
+            twin.attempts < twin.max_attempts,
+        )
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(Job)
+        .where(retryable, ~_queued_twin_exists(), Job.dedupe_key.is_(None) | (Job.id == oldest_of_key))
+        .values(status="queued", locked_at=None, last_error="Worker lost")
+    )
+    db.execute(
+        update(Job)
+        .where(stale)
+        .values(status="failed", locked_at=None, last_error="Worker lost", finished_at=func.now())
+    )
+    db.commit()
+    return result.rowcount
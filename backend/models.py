@@ -1,20 +1,43 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, Table, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import (DDL, BigInteger, Column, FetchedValue, Integer, String, Boolean, Date, DateTime, Table,
+                        ForeignKey, Text, Index, event, func, text)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import relationship, validates
 from db import Base
+from utils import name_sort_keys, normalize_name
+
+
+# ------- name sorting -------
+# people are listed by (sort_last_name, sort_first_name), kept in sync with name by
+# _set_name_keys below and by the bulk writes of csv_import and batch. The keys are already folded
+# like normalize_name, the collation orders what is left (hyphens, apostrophes, œ...) the French way
+SORT_COLLATION = "fr_icu"
+event.listen(Base.metadata, "before_create", DDL(
+    f"CREATE COLLATION IF NOT EXISTS {SORT_COLLATION} (provider = icu, locale = 'fr')"
+))
+event.listen(Base.metadata, "after_drop", DDL(f"DROP COLLATION IF EXISTS {SORT_COLLATION}"))
+
+
+def revision_column() -> Column:
+    """
+    Transaction that last wrote the row, set by the set_revision trigger below, see sync.py
+    """
+    return Column("revision", BigInteger, nullable=False, index=True,
+                  server_default=FetchedValue(), server_onupdate=FetchedValue())
 
 
 # association tables
 event_participant = Table(
     'event_participant', Base.metadata,
     Column('event_id', Integer, ForeignKey('events.id')),
-    Column('participant_id', Integer, ForeignKey('participants.id'))
+    Column('participant_id', Integer, ForeignKey('participants.id')),
+    revision_column(),
 )
 
 event_speaker = Table(
     'event_speaker', Base.metadata,
     Column('event_id', Integer, ForeignKey('events.id')),
-    Column('speaker_id', Integer, ForeignKey('speakers.id'))
+    Column('speaker_id', Integer, ForeignKey('speakers.id')),
+    revision_column(),
 )
 
 
@@ -27,6 +50,20 @@ class Participant(Base):
     note = Column(String)
     is_plusone = Column(Boolean)
     picture_file = Column(String)
+    revision = revision_column()
+    sort_last_name = Column(String(collation=SORT_COLLATION), nullable=False, server_default="")
+    sort_first_name = Column(String(collation=SORT_COLLATION), nullable=False, server_default="")
+
+    __table_args__ = (
+        Index("ix_participants_sort_name", "sort_last_name", "sort_first_name", "id"),
+    )
+
+    @validates("name")
+    def _set_name_keys(self, key, name):
+        # csv_import matches rows on normalized_name
+        self.normalized_name = normalize_name(name) if name and name.strip() else None
+        self.sort_last_name, self.sort_first_name = name_sort_keys(name)
+        return name
 
 
 class Event(Base):
@@ -37,8 +74,14 @@ class Event(Base):
     date = Column(Date)
     story = Column(Text)
     notes = Column(Text)
+    # rendered by render.py, key is the hash of what they were rendered from
+    story_html = Column(Text)
+    story_html_key = Column(String(64))
+    notes_html = Column(Text)
+    notes_html_key = Column(String(64))
     cover_photo = Column(String)
     script_files = Column(ARRAY(String))
+    revision = revision_column()
     speaker = relationship("Speaker", secondary=event_speaker)
     participants = relationship("Participant", secondary=event_participant)
 
@@ -50,6 +93,18 @@ class Speaker(Base):
     ktaname = Column(String)
     labo = Column(String)
     picture_file = Column(String)
+    revision = revision_column()
+    sort_last_name = Column(String(collation=SORT_COLLATION), nullable=False, server_default="")
+    sort_first_name = Column(String(collation=SORT_COLLATION), nullable=False, server_default="")
+
+    __table_args__ = (
+        Index("ix_speakers_sort_name", "sort_last_name", "sort_first_name", "id"),
+    )
+
+    @validates("name")
+    def _set_sort_keys(self, key, name):
+        self.sort_last_name, self.sort_first_name = name_sort_keys(name)
+        return name
 
 
 class Prospect(Base):
@@ -61,4 +116,122 @@ class Prospect(Base):
     response = Column(String)
     domain = Column(String)
     suggested_by = Column(String)
-    remarks = Column(Text)
\ No newline at end of file
+    remarks = Column(Text)
+    revision = revision_column()
+
+
+class Job(Base):
+    """
+    Background work, picked up by worker.py (see jobs.py)
+    """
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    status = Column(String, nullable=False, server_default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False, server_default="5")
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True))
+    # at most one queued job per dedupe key, later enqueues are merged into it
+    dedupe_key = Column(String)
+    last_error = Column(Text)
+    result = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_jobs_queued_run_after", "run_after", postgresql_where=text("status = 'queued'")),
+        Index("uq_jobs_queued_dedupe_key", "dedupe_key", unique=True,
+              postgresql_where=text("status = 'queued' AND dedupe_key IS NOT NULL")),
+    )
+
+
+# ------- change notifications, see changes.py -------
+CHANGES_CHANNEL = "kadmin_changes"
+NOTIFIED_TABLES = ["events", "speakers", "participants", "prospects", "event_participant", "event_speaker"]
+
+# statement-level: one notification per statement whatever the number of rows, and Postgres
+# folds identical ones within a transaction. Delivered on commit only, never on rollback.
+event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGES_CHANNEL}', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+for _table in NOTIFIED_TABLES:
+    event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER {_table}_notify_change
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {_table}
+FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+"""))
+event.listen(Base.metadata, "before_drop", DDL("DROP FUNCTION IF EXISTS notify_table_change() CASCADE"))
+
+
+# ------- revisions and tombstones, for the /api/changes feed, see sync.py -------
+class Tombstone(Base):
+    """
+    One per deleted row of a TRACKED_TABLES table, key is {"id": ...} or the association's pair
+    """
+    __tablename__ = "tombstones"
+    id = Column(BigInteger, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_key = Column(JSONB, nullable=False)
+    revision = Column(BigInteger, nullable=False, index=True,
+                      server_default=text("pg_current_xact_id()::text::bigint"))
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# table -> columns identifying a row
+TRACKED_TABLES = {
+    "events": ["id"],
+    "speakers": ["id"],
+    "participants": ["id"],
+    "prospects": ["id"],
+    "event_participant": ["event_id", "participant_id"],
+    "event_speaker": ["event_id", "speaker_id"],
+}
+
+# revision is the writing transaction's id: unlike a sequence value, whether it can still
+# show up later is known from any snapshot (see sync.changes_since)
+event.listen(Base.metadata, "after_create", DDL("""
+CREATE OR REPLACE FUNCTION set_revision() RETURNS trigger AS $$
+BEGIN
+    NEW.revision := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""))
+# trigger arguments are the key columns
+event.listen(Base.metadata, "after_create", DDL("""
+CREATE OR REPLACE FUNCTION record_deletion() RETURNS trigger AS $$
+DECLARE
+    old_row jsonb := to_jsonb(OLD);
+    row_key jsonb := '{}';
+    col text;
+BEGIN
+    FOREACH col IN ARRAY TG_ARGV LOOP
+        row_key := row_key || jsonb_build_object(col, old_row -> col);
+    END LOOP;
+    INSERT INTO tombstones (table_name, row_key) VALUES (TG_TABLE_NAME, row_key);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+for _table, _key in TRACKED_TABLES.items():
+    event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER {_table}_set_revision
+BEFORE INSERT OR UPDATE ON {_table}
+FOR EACH ROW EXECUTE FUNCTION set_revision()
+"""))
+    event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER {_table}_record_deletion
+AFTER DELETE ON {_table}
+FOR EACH ROW EXECUTE FUNCTION record_deletion({", ".join(f"'{c}'" for c in _key)})
+"""))
+event.listen(Base.metadata, "before_drop", DDL("DROP FUNCTION IF EXISTS set_revision() CASCADE"))
+event.listen(Base.metadata, "before_drop", DDL("DROP FUNCTION IF EXISTS record_deletion() CASCADE"))
+
+import stats  # noqa: E402, F401, registers the statistics views with the tables
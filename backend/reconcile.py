@@ -0,0 +1,124 @@
+import datetime
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import UPLOADS, PHOTOS, SPEAKER_PHOTOS, EVENT_PHOTOS, JOB_STAGING_PREFIX
+from db import SessionLocal
+from models import Event, Job, Participant, Speaker
+from storage import Storage
+
+# files younger than this are never orphans: they may belong to a request still in flight
+DEFAULT_GRACE = datetime.timedelta(hours=24)
+BATCH_SIZE = 500
+
+
+def _batched(it, size):
+    batch = []
+    for item in it:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def referenced_files(db: Session) -> dict[Storage, dict[str, tuple[str, int]]]:
+    """
+    For each storage, key -> (table, id) of the row pointing to it.
+    One query per table.
+    """
+    uploads, photos, speaker_photos, covers, staged = {}, {}, {}, {}, {}
+
+    for event_id, stored_name in db.execute(select(Event.id, func.unnest(Event.script_files))):
+        # seeded events point to absolute paths in data/descentes/, not in uploads/
+        if stored_name and not Path(stored_name).is_absolute():
+            uploads[stored_name] = ("events", event_id)
+
+    for event_id, cover_photo in db.execute(select(Event.id, Event.cover_photo).where(Event.cover_photo.is_not(None))):
+        covers[cover_photo] = ("events", event_id)
+
+    for pid, picture_file in db.execute(
+        select(Participant.id, Participant.picture_file).where(Participant.picture_file.is_not(None))
+    ):
+        photos[picture_file] = ("participants", pid)
+
+    for sid, picture_file in db.execute(
+        select(Speaker.id, Speaker.picture_file).where(Speaker.picture_file.is_not(None))
+    ):
+        speaker_photos[picture_file] = ("speakers", sid)
+
+    # zips waiting for an import job, in uploads/.jobs/
+    for job_id, key in db.execute(
+        select(Job.id, Job.payload["key"].astext)
+        .where(Job.kind == "import_event_zip", Job.status.in_(["queued", "running"]))
+    ):
+        if key and key.startswith(JOB_STAGING_PREFIX):
+            staged[key] = ("jobs", job_id)
+
+    uploads.update(staged)
+    return {UPLOADS: uploads, PHOTOS: photos, SPEAKER_PHOTOS: speaker_photos, EVENT_PHOTOS: covers}
+
+
+def reconcile(db: Session, delete: bool = False, grace: datetime.timedelta = DEFAULT_GRACE) -> dict:
+    """
+    Compares the storages with what the DB points to:
+    - orphans: files no row references, older than grace. Removed if delete.
+    - missing: rows pointing to a file that isn't there.
+    """
+    cutoff = time.time() - grace.total_seconds()
+    report = {}
+
+    for storage, refs in referenced_files(db).items():
+        seen = set()
+        orphans, orphan_bytes, deleted = [], 0, 0
+
+        for batch in _batched(storage.scan(), BATCH_SIZE):
+            for key, size, mtime in batch:
+                seen.add(key)
+                if key in refs or mtime > cutoff:
+                    continue
+                orphans.append(key)
+                orphan_bytes += size
+                if delete:
+                    storage.delete(key)
+                    deleted += 1
+
+        missing = [
+            {"table": table, "id": row_id, "path": key}
+            for key, (table, row_id) in refs.items()
+            if key not in seen
+        ]
+        report[str(storage)] = {
+            "scanned": len(seen),
+            "orphans": orphans,
+            "orphan_bytes": orphan_bytes,
+            "deleted": deleted,
+            "missing": missing,
+        }
+
+    return report
+
+
+if __name__ == '__main__':
+    # python reconcile.py [--delete] [--grace-hours N]
+    args = sys.argv[1:]
+    grace = DEFAULT_GRACE
+    if "--grace-hours" in args:
+        grace = datetime.timedelta(hours=float(args[args.index("--grace-hours") + 1]))
+
+    db = SessionLocal()
+    report = reconcile(db, delete="--delete" in args, grace=grace)
+    db.close()
+
+    for root, r in report.items():
+        print(f"{root}: {r['scanned']} files, {len(r['orphans'])} orphans ({r['orphan_bytes']} bytes)"
+              f"{', deleted' if r['deleted'] else ''}, {len(r['missing'])} missing")
+        for path in r["orphans"]:
+            print(f"  orphan  {path}")
+        for m in r["missing"]:
+            print(f"  missing {m['path']} ({m['table']} #{m['id']})")
@@ -0,0 +1,98 @@
+import hashlib
+from typing import Any
+from xml.etree import ElementTree
+
+import nh3
+from latex2mathml.converter import convert as latex_to_mathml
+from markdown_it import MarkdownIt
+from markdown_it.common.utils import escapeHtml
+from mdit_py_plugins.dollarmath import dollarmath_plugin
+
+
+# bump when the rendering changes, so rerender.py picks up every stored html
+RENDERER_VERSION = "1"
+
+RENDERED_FIELDS = ("story", "notes")
+
+MATHML_TAGS = {
+    "math", "semantics", "annotation", "mrow", "mi", "mn", "mo", "ms", "mtext", "mspace", "mstyle",
+    "msub", "msup", "msubsup", "munder", "mover", "munderover", "mfrac", "msqrt", "mroot",
+    "mtable", "mtr", "mtd", "menclose", "mpadded", "mphantom", "merror",
+}
+MATHML_ATTRIBUTES = {
+    "display", "xmlns", "mathvariant", "mathsize", "mathcolor", "mathbackground",
+    "stretchy", "fence", "separator", "form", "largeop", "symmetric", "movablelimits",
+    "lspace", "rspace", "minsize", "maxsize", "accent", "accentunder", "linethickness",
+    "displaystyle", "scriptlevel", "width", "height", "depth", "notation", "open", "close",
+    "columnalign", "columnlines", "columnspacing", "rowalign", "rowlines", "rowspacing", "frame",
+}
+ALLOWED_TAGS = nh3.ALLOWED_TAGS | MATHML_TAGS
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    **{tag: MATHML_ATTRIBUTES for tag in MATHML_TAGS},
+    "span": {"class"},
+    "div": {"class"},
+    "code": {"class"},
+}
+
+
+def _render_math(latex: str, options: dict[str, Any]) -> str:
+    """
+    LaTeX to MathML once at write time, so browsers display it natively without a JS renderer
+    """
+    try:
+        mathml = latex_to_mathml(latex, display="block" if options.get("display_mode") else "inline")
+        # \text{...} contents come out unescaped, anything that's not well-formed is an error
+        ElementTree.fromstring(mathml)
+        return mathml
+    except Exception:
+        # keep the source visible rather than failing the whole text
+        return f'<code class="math-error">{escapeHtml(latex)}</code>'
+
+
+# raw HTML in the source is escaped rather than passed through
+_md = (
+    MarkdownIt("commonmark", {"html": False, "linkify": False, "typographer": False})
+    .enable("table")
+    .enable("strikethrough")
+    .use(dollarmath_plugin, allow_digits=False, double_inline=True, renderer=_render_math)
+)
+
+
+def _render_math_inline_double(self, tokens, idx, options, env) -> str:
+    # $$...$$ in the middle of a paragraph: the plugin's <div> would split the <p>
+    return f'<span class="math display">{_render_math(tokens[idx].content, {"display_mode": True})}</span>'
+
+
+_md.add_render_rule("math_inline_double", _render_math_inline_double)
+
+
+def render_markdown(text: str) -> str:
+    """
+    Markdown with $inline$ and $$display$$ LaTeX to sanitized HTML + MathML
+    """
+    return nh3.clean(_md.render(text), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+
+def source_key(text: str) -> str:
+    """
+    What the stored html was rendered from: same source and renderer version, same html
+    """
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{text}".encode("utf-8")).hexdigest()
+
+
+def render_event_texts(ev, force: bool = False) -> bool:
+    """
+    Refreshes an Event's story_html / notes_html if their source changed. Returns whether anything did.
+    """
+    changed = False
+    for field in RENDERED_FIELDS:
+        text = getattr(ev, field)
+        key = source_key(text) if text else None
+        if not force and getattr(ev, f"{field}_html_key") == key:
+            continue
+
+        setattr(ev, f"{field}_html", render_markdown(text) if text else None)
+        setattr(ev, f"{field}_html_key", key)
+        changed = True
+    return changed
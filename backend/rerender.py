@@ -0,0 +1,32 @@
+import sys
+
+from sqlalchemy import select
+
+from db import SessionLocal
+from models import Event
+from render import render_event_texts
+
+BATCH_SIZE = 50
+
+
+def rerender_events(db, force: bool = False) -> int:
+    """
+    Re-renders the story/notes html of every event whose cached html is stale,
+    e.g. after bumping render.RENDERER_VERSION. Returns how many events changed.
+    """
+    count = 0
+    ids = db.scalars(select(Event.id).order_by(Event.id)).all()
+    for start in range(0, len(ids), BATCH_SIZE):
+        for ev in db.scalars(select(Event).where(Event.id.in_(ids[start:start + BATCH_SIZE]))):
+            if render_event_texts(ev, force=force):
+                count += 1
+        db.commit()
+    return count
+
+
+if __name__ == '__main__':
+    # python rerender.py [--force]
+    db = SessionLocal()
+    count = rerender_events(db, force="--force" in sys.argv[1:])
+    print(f"Re-rendered {count} events")
+    db.close()
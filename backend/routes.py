@@ -1,34 +1,64 @@
-from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path, PurePosixPath
 
+import csv
 import datetime
+import io
+import json
+import math
+import time
 import uuid
+import zipfile
 
-from fastapi import FastAPI, Depends, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import text
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
 
-from typing import List
+from pydantic import TypeAdapter
+from typing import Callable, List, Literal
 
-from db import SessionLocal
-from models import Event, Speaker, Participant, Prospect
+from config import UPLOADS, PHOTOS, SPEAKER_PHOTOS, EVENT_PHOTOS, ALLOWED_PHOTO_EXTS, JOB_STAGING_PREFIX
+from db import REPLICA_LAG_SECONDS, ReadSessionLocal, SessionLocal, replica_engine
+from models import Event, Speaker, Participant, Prospect, Job, event_participant, event_speaker
 from schemas import EventBase, EventDetail, SpeakerBase, ParticipantBase, ParticipantCreate, ParticipantUpdate, ProspectBase, ProspectCreate, ProspectUpdate
-
+from schemas import ImportReport, EventParticipantsSet, EventParticipantsPatch, EventParticipantsDiff
+from schemas import JobAccepted, JobStatus
+from schemas import BatchRequest, BatchResult, ChangesFeed
+from schemas import StatsSummary, ParticipantAttendance, SpeakerActivity, EventAttendance, YearAttendance
+
+import attendance
+import batch
+import contact_sheet
+from cache import TableCache
+from changes import Listener, publish
+import export
+import jobs
+import stats
+import sync
+from file_serving import serve_file
+from storage import Storage
+from csv_import import check_columns, import_participants, import_prospects, prospect_reader
 from utils import normalize_name
+from zipstream import iter_zip
+
+
+# list responses, per worker process. Kept in sync across processes through the changes listener.
+# With a replica, what is read right after a change may predate it: not kept for the lag window.
+responses = TableCache(settle_seconds=REPLICA_LAG_SECONDS if replica_engine is not None else 0)
+listener = Listener(on_change=responses.invalidate, on_ready=responses.enable, on_lost=responses.disable)
 
 
-app = FastAPI()
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listener.start()
+    yield
+    listener.stop()
 
-PHOTO_DIR = Path("data") / "photos-trombi"
-PHOTO_DIR.mkdir(parents=True, exist_ok=True)
-SPEAKER_PHOTO_DIR = Path("data") / "photos-speakers"
-SPEAKER_PHOTO_DIR.mkdir(exist_ok=True)
-EVENT_PHOTO_DIR = Path("data") / "photos-events"
-EVENT_PHOTO_DIR.mkdir(exist_ok=True)
-ALLOWED_PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
+
+app = FastAPI(lifespan=lifespan)
 
 # vite
 app.add_middleware(
@@ -40,8 +70,36 @@ app.add_middleware(
 )
 
 
-def get_db():
-    db = SessionLocal()
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# set on clients that just wrote, until the replica has surely caught up with their writes
+PRIMARY_COOKIE = "kadmin_primary_until"
+
+
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next):
+    response = await call_next(request)
+    if replica_engine is not None and request.method not in READ_METHODS and response.status_code < 400:
+        until = time.time() + REPLICA_LAG_SECONDS
+        response.set_cookie(PRIMARY_COOKIE, f"{until:.3f}", max_age=math.ceil(REPLICA_LAG_SECONDS), httponly=True)
+    return response
+
+
+def pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def get_db(request: Request):
+    """
+    Reads go to the replica if there is one, except for clients that wrote in the last
+    few seconds: they would not see their own changes yet
+    """
+    if request.method in READ_METHODS and not pinned_to_primary(request):
+        db = ReadSessionLocal()
+    else:
+        db = SessionLocal()
     try:
         yield db
     finally:
@@ -53,6 +111,96 @@ async def read_text_upload(upload: UploadFile) -> str:
     return data.decode("utf-8", errors="replace")
 
 
+@contextmanager
+def text_upload(upload: UploadFile):
+    """
+    Decodes an upload line by line instead of reading it whole, for CSV imports
+    """
+    f = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        yield f
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable CSV: {e}")
+    finally:
+        f.detach()  # leave the upload file open, FastAPI closes it
+
+
+def delete_script_file(stored_name: str):
+    """
+    Only removes uploaded scripts: seeded events may point straight into data/descentes/
+    """
+    if not Path(stored_name).is_absolute():
+        UPLOADS.delete(stored_name)
+
+
+def cached_list(key: str, tables: list[str], model, build: Callable[[], list]) -> Response:
+    """
+    JSON list response, computed once per process until one of the tables changes
+    """
+    adapter = TypeAdapter(list[model])
+
+    def render() -> bytes:
+        return adapter.dump_json(adapter.validate_python(build(), from_attributes=True))
+
+    return Response(content=responses.get(key, tables, render), media_type="application/json")
+
+
+def etag_response(request: Request, etag: str, content: bytes, media_type: str, cache_control: str) -> Response:
+    """
+    304 without the content when the client already has this version (If-None-Match)
+    """
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if f'"{etag}"' in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def cached_contact_sheet(kind: str, storage: Storage, pictures: Callable[[], list],
+                         tile_size: int = contact_sheet.TILE_SIZE) -> contact_sheet.Sheet:
+    """
+    Rebuilt when the table changes, a new picture file name or the speakers publish() of a replaced one
+    """
+    return responses.get(f"{kind}/contact-sheet", [kind], lambda: contact_sheet.build(storage, pictures(), tile_size))
+
+
+def contact_sheet_map(request: Request, kind: str, sheet: contact_sheet.Sheet) -> Response:
+    content = json.dumps({
+        # versioned: the image itself can be cached for good
+        "image": f"/api/{kind}/contact-sheet.jpg?v={sheet.etag}",
+        "tile_size": sheet.tile_size,
+        "width": sheet.width,
+        "height": sheet.height,
+        "tiles": sheet.tiles,
+    }).encode()
+    return etag_response(request, sheet.etag, content, "application/json", "no-cache")
+
+
+def contact_sheet_image(request: Request, sheet: contact_sheet.Sheet, v: str | None) -> Response:
+    cache_control = "public, max-age=31536000, immutable" if v == sheet.etag else "no-cache"
+    return etag_response(request, sheet.etag, sheet.image, "image/jpeg", cache_control)
+
+
+async def save_upload(storage: Storage, key: str, upload: UploadFile):
+    """
+    Streams an upload to storage from a worker thread, an S3 upload would block the event loop
+    """
+    await run_in_threadpool(storage.save, key, upload.file)
+
+
+async def store_scripts(scripts: list[UploadFile]) -> list[str]:
+    """
+    Saves uploaded scripts under fresh names, returns the names to append to script_files
+    """
+    stored_files = []
+    for script in scripts:
+        suffix = Path(script.filename).suffix.lower()  # keep extension
+        stored_name = f"{uuid.uuid4().hex}{suffix}"
+        await save_upload(UPLOADS, stored_name, script)
+        stored_files.append(stored_name)
+    return stored_files
+
+
 # ------- SANITY CHECKS -------
 @app.get("/api/db-check")
 def db_check(db: Session = Depends(get_db)):
@@ -68,7 +216,8 @@ def read_root():
 # ------- EVENT ROUTES -------
 @app.get("/api/events", response_model=List[EventBase])
 def get_events(db: Session = Depends(get_db)):
-    return db.query(Event).order_by(Event.number.asc()).all()
+    return cached_list("events", ["events"], EventBase,
+                       lambda: db.query(Event).order_by(Event.number.asc()).all())
 
 
 @app.get("/api/events/{event_id}", response_model=EventDetail)
@@ -108,15 +257,7 @@ async def create_event(
     # Script file
     stored_files = None
     if script is not None:
-        suffix = Path(script.filename).suffix.lower()  # keep extension
-        stored_name = f"{uuid.uuid4().hex}{suffix}"
-        stored_path = UPLOAD_DIR / stored_name
-
-        with stored_path.open("wb") as f:
-            while chunk := await script.read(1024 * 1024):
-                f.write(chunk)
-
-        stored_files = [stored_name]  # store internal file name(s)
+        stored_files = await store_scripts([script])
 
     # Notes / Story files
     story_text = None
@@ -141,11 +282,7 @@ async def create_event(
 
         slug = normalize_name(speaker.name or "")
         filename = f"{slug}{ext}"
-        stored_path = SPEAKER_PHOTO_DIR / filename
-
-        with stored_path.open("wb") as f:
-            while chunk := await speaker_picture.read(1024 * 1024):
-                f.write(chunk)
+        await save_upload(SPEAKER_PHOTOS, filename, speaker_picture)
 
         speaker.picture_file = filename
 
@@ -162,13 +299,43 @@ async def create_event(
         speaker=[speaker]
     )
     db.add(ev)
+    db.flush()
+
+    jobs.enqueue(db, "render_event", {"event_id": ev.id}, dedupe_key=f"render_event:{ev.id}")
     db.commit()
     db.refresh(ev)
     return ev
 
 
+@app.post("/api/events/import", status_code=202, response_model=JobAccepted)
+def import_event(
+    response: Response,
+    file: UploadFile = File(...),
+    number: int | None = Form(None),  # defaults to the NN of the NN-xxx/ folder
+    db: Session = Depends(get_db),
+):
+    if not zipfile.is_zipfile(file.file):
+        raise HTTPException(status_code=400, detail="Not a zip file")
+    file.file.seek(0)
+
+    # staged in the shared storage, the worker picking the job may run on another machine
+    staged = f"{JOB_STAGING_PREFIX}{uuid.uuid4().hex}.zip"
+    UPLOADS.save(staged, file.file)
+
+    job_id = jobs.enqueue(db, "import_event_zip", {"key": staged, "number": number}, max_attempts=3)
+    db.commit()
+
+    response.headers["Location"] = f"/api/jobs/{job_id}"
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+
+
 @app.get("/api/events/{event_id}/script")
 def download_event_script(event_id: int, db: Session = Depends(get_db)):
+    return download_event_script_file(event_id, 0, db)
+
+
+@app.get("/api/events/{event_id}/scripts/{index}")
+def download_event_script_file(event_id: int, index: int, db: Session = Depends(get_db)):
     ev = db.query(Event).filter(Event.id == event_id).first()
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -176,12 +343,76 @@ def download_event_script(event_id: int, db: Session = Depends(get_db)):
     if not ev.script_files or len(ev.script_files) == 0:
         raise HTTPException(status_code=404, detail="No script uploaded for this event")
 
-    stored_name = ev.script_files[0]
-    path = UPLOAD_DIR / stored_name
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Script missing on disk")
+    if not 0 <= index < len(ev.script_files):
+        raise HTTPException(status_code=404, detail="No script at this index")
+
+    stored_name = ev.script_files[index]
+    return serve_file(UPLOADS, stored_name, filename=PurePosixPath(stored_name).name,
+                      missing_detail="Script missing on disk")
+
+
+@app.get("/api/events/{event_id}/scripts.zip")
+def download_event_scripts_zip(event_id: int, db: Session = Depends(get_db)):
+    ev = db.query(Event).filter(Event.id == event_id).first()
+    if not ev:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    stored_names = [name for name in ev.script_files or [] if UPLOADS.exists(name)]
+    if not stored_names:
+        raise HTTPException(status_code=404, detail="No script uploaded for this event")
+
+    entries = []
+    used = set()
+    for i, stored_name in enumerate(stored_names):
+        name = PurePosixPath(stored_name).name
+        arcname = name if name not in used else f"{i}-{name}"
+        used.add(arcname)
+        entries.append((arcname, UPLOADS.content(stored_name)))
+
+    # scripts are mostly PDFs, already compressed: stored mode, built on the fly
+    return StreamingResponse(
+        iter_zip(entries, compression=zipfile.ZIP_STORED),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="script-{ev.number}.zip"'},
+    )
+
+
+@app.post("/api/events/{event_id}/scripts", response_model=EventBase)
+async def upload_event_scripts(
+    event_id: int,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+):
+    ev = db.query(Event).filter(Event.id == event_id).with_for_update().first()
+    if not ev:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    stored_files = await store_scripts(files)
+
+    # appends, ARRAY columns are not mutation-tracked so reassign
+    ev.script_files = (ev.script_files or []) + stored_files
+    db.commit()
+    db.refresh(ev)
+    return ev
+
+
+@app.delete("/api/events/{event_id}/scripts/{index}", response_model=EventBase)
+def delete_event_script(event_id: int, index: int, db: Session = Depends(get_db)):
+    ev = db.query(Event).filter(Event.id == event_id).with_for_update().first()
+    if not ev:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    if not ev.script_files or not 0 <= index < len(ev.script_files):
+        raise HTTPException(status_code=404, detail="No script at this index")
+
+    stored_name = ev.script_files[index]
+    ev.script_files = ev.script_files[:index] + ev.script_files[index + 1:]
+    db.commit()
 
-    return FileResponse(path=str(path), filename=stored_name)
+    delete_script_file(stored_name)
+
+    db.refresh(ev)
+    return ev
 
 
 @app.put("/api/events/{event_id}", response_model=EventBase)
@@ -195,7 +426,8 @@ async def update_event(
     script: UploadFile | None = File(None),
     db: Session = Depends(get_db),
 ):
-    ev = db.query(Event).filter(Event.id == event_id).first()
+    # locked like the scripts endpoints, an append must not lose a concurrent one
+    ev = db.query(Event).filter(Event.id == event_id).with_for_update().first()
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -214,30 +446,21 @@ async def update_event(
     ev.title = title
     ev.date = parsed_date
 
-    # story and notes text
+    # story and notes text. Their old HTML goes: until render_event runs, the page shows the raw text
     if story_file is not None:
         ev.story = (await read_text_upload(story_file))
+        ev.story_html = ev.story_html_key = None
 
     if notes_file is not None:
         ev.notes = (await read_text_upload(notes_file))
+        ev.notes_html = ev.notes_html_key = None
 
-    # optional: replace script (delete old)
-    if script is not None:
-        if ev.script_files and len(ev.script_files) > 0:
-            old_name = ev.script_files[0]
-            old_path = UPLOAD_DIR / old_name
-            if old_path.exists():
-                old_path.unlink()
-
-        suffix = Path(script.filename).suffix.lower()
-        stored_name = f"{uuid.uuid4().hex}{suffix}"
-        stored_path = UPLOAD_DIR / stored_name
-
-        with stored_path.open("wb") as f:
-            while chunk := await script.read(1024 * 1024):
-                f.write(chunk)
+    if story_file is not None or notes_file is not None:
+        jobs.enqueue(db, "render_event", {"event_id": ev.id}, dedupe_key=f"render_event:{ev.id}")
 
-        ev.script_files = [stored_name]
+    # optional: one more script, like POST /api/events/{id}/scripts (removing one is DELETE .../scripts/{index})
+    if script is not None:
+        ev.script_files = (ev.script_files or []) + await store_scripts([script])
 
     db.commit()
     db.refresh(ev)
@@ -250,20 +473,16 @@ def delete_event(event_id: int, db: Session = Depends(get_db)):
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    # delete script file if present
-    if ev.script_files and len(ev.script_files) > 0:
-        stored_name = ev.script_files[0]
-        path = UPLOAD_DIR / stored_name
-        if path.exists():
-            path.unlink()
-
-    if ev.cover_photo:
-        path = EVENT_PHOTO_DIR / ev.cover_photo
-        if path.exists():
-            path.unlink()
-
+    script_files, cover_photo = ev.script_files or [], ev.cover_photo
     db.delete(ev)
     db.commit()
+
+    # files go once the row is gone: a failed commit leaves nothing pointing at missing files
+    for stored_name in script_files:
+        delete_script_file(stored_name)
+    if cover_photo:
+        EVENT_PHOTOS.delete(cover_photo)
+
     return {"ok": True}
 
 
@@ -276,11 +495,7 @@ def get_event_cover(event_id: int, db: Session = Depends(get_db)):
     if not ev.cover_photo:
         raise HTTPException(status_code=404, detail="No cover for event")
 
-    path = EVENT_PHOTO_DIR / ev.cover_photo
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Cover file missing on disk")
-
-    return FileResponse(path=str(path))
+    return serve_file(EVENT_PHOTOS, ev.cover_photo, missing_detail="Cover file missing on disk")
 
 
 @app.post("/api/events/{event_id}/cover", response_model=EventBase)
@@ -300,62 +515,112 @@ async def upload_event_cover(
     if ext not in ALLOWED_PHOTO_EXTS:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    # ensure event folder exists
-    event_folder = EVENT_PHOTO_DIR / str(ev.number)
-    event_folder.mkdir(parents=True, exist_ok=True)
-
     # delete old cover file if present
     if ev.cover_photo:
-        old_path = EVENT_PHOTO_DIR / ev.cover_photo
-        if old_path.exists():
-            old_path.unlink()
+        EVENT_PHOTOS.delete(ev.cover_photo)
 
-    # store new file
-    filename = f"{ev.number}_title{ext}"
-    rel_path = Path(str(ev.number)) / filename   # stored in DB
-    abs_path = EVENT_PHOTO_DIR / rel_path
-
-    with abs_path.open("wb") as f:
-        while chunk := await file.read(1024 * 1024):
-            f.write(chunk)
+    # store new file, in the event's folder
+    rel_path = f"{ev.number}/{ev.number}_title{ext}"   # stored in DB
+    await save_upload(EVENT_PHOTOS, rel_path, file)
 
     # update DB
-    ev.cover_photo = str(rel_path)
+    ev.cover_photo = rel_path
+    publish(db, "events")  # same file name, the row may not change
     db.commit()
     db.refresh(ev)
 
     return ev
 
 
+@app.put("/api/events/{event_id}/participants", response_model=EventParticipantsDiff)
+def set_event_participants(event_id: int, payload: EventParticipantsSet, db: Session = Depends(get_db)):
+    if not attendance.lock_event(db, event_id):
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    unknown = attendance.unknown_participants(db, payload.participant_ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown participants: {unknown}")
+
+    added, removed = attendance.set_participants(db, event_id, payload.participant_ids)
+    db.commit()
+
+    return {
+        "participant_ids": attendance.event_participant_ids(db, event_id),
+        "added": added,
+        "removed": removed,
+    }
+
+
+@app.patch("/api/events/{event_id}/participants", response_model=EventParticipantsDiff)
+def patch_event_participants(event_id: int, payload: EventParticipantsPatch, db: Session = Depends(get_db)):
+    if set(payload.add) & set(payload.remove):
+        raise HTTPException(status_code=400, detail="Same participant in add and remove")
+
+    if not attendance.lock_event(db, event_id):
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    unknown = attendance.unknown_participants(db, payload.add)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown participants: {unknown}")
+
+    removed = attendance.remove_participants(db, event_id, payload.remove)
+    added = attendance.add_participants(db, event_id, payload.add)
+    db.commit()
+
+    return {
+        "participant_ids": attendance.event_participant_ids(db, event_id),
+        "added": added,
+        "removed": removed,
+    }
+
+
 # ------- SPEAKERS ROUTES -------
 @app.get("/api/speakers", response_model=list[SpeakerBase])
-def get_speakers(db: Session = Depends(get_db)):
-    def last_name_key(name: str | None):
-        if not name:
-            return ""
-        return name.strip().split()[-1].lower()
-
-    speakers = db.query(Speaker).all()
-    speakers.sort(key=lambda s: last_name_key(s.name))
-
-    out = []
-    for s in speakers:
-        events = (
-            db.query(Event)
-              .filter(Event.speaker.any(Speaker.id == s.id))
-              .all()
-        )
-        event_numbers = sorted([e.number for e in events if e.number is not None])
-
-        out.append({
-            "id": s.id,
-            "name": s.name,
-            "ktaname": s.ktaname,
-            "labo": s.labo,
-            "picture_file": s.picture_file,
-            "event_numbers": event_numbers,
-        })
-    return out
+def get_speakers(limit: int | None = Query(None, ge=1, le=1000), offset: int = Query(0, ge=0),
+                 db: Session = Depends(get_db)):
+    return cached_list(f"speakers?limit={limit}&offset={offset}", ["speakers", "event_speaker", "events"],
+                       SpeakerBase, lambda: list_speakers(db, limit, offset))
+
+
+def list_speakers(db: Session, limit: int | None = None, offset: int = 0) -> list[dict]:
+    """
+    By last then first name, sorted and paginated by Postgres along ix_speakers_sort_name
+    """
+    event_numbers = export.event_numbers_query(event_speaker, event_speaker.c.speaker_id, Speaker.id)
+    rows = db.execute(
+        select(Speaker.id, Speaker.name, Speaker.ktaname, Speaker.labo, Speaker.picture_file,
+               event_numbers.label("event_numbers"))
+        .order_by(Speaker.sort_last_name, Speaker.sort_first_name, Speaker.id)
+        .limit(limit).offset(offset)
+    ).mappings()
+    return [{**row, "event_numbers": row["event_numbers"] or []} for row in rows]
+
+
+# the speakers page shows big bubbles
+SPEAKER_TILE_SIZE = 2 * contact_sheet.TILE_SIZE
+
+
+def speaker_pictures(db: Session) -> list[tuple[int, str]]:
+    return db.execute(
+        select(Speaker.id, Speaker.picture_file)
+        .where(Speaker.picture_file.is_not(None))
+        .order_by(Speaker.sort_last_name, Speaker.sort_first_name, Speaker.id)
+    ).all()
+
+
+@app.get("/api/speakers/contact-sheet")
+def get_speakers_contact_sheet(request: Request, db: Session = Depends(get_db)):
+    """
+    Where each speaker's thumbnail is in the contact sheet image: {"tiles": {id: [x, y]}, ...}
+    """
+    sheet = cached_contact_sheet("speakers", SPEAKER_PHOTOS, lambda: speaker_pictures(db), SPEAKER_TILE_SIZE)
+    return contact_sheet_map(request, "speakers", sheet)
+
+
+@app.get("/api/speakers/contact-sheet.jpg")
+def get_speakers_contact_sheet_image(request: Request, v: str | None = None, db: Session = Depends(get_db)):
+    sheet = cached_contact_sheet("speakers", SPEAKER_PHOTOS, lambda: speaker_pictures(db), SPEAKER_TILE_SIZE)
+    return contact_sheet_image(request, sheet, v)
 
 
 @app.get("/api/speakers/{speaker_id}/picture")
@@ -367,11 +632,7 @@ def get_speaker_picture(speaker_id: int, db: Session = Depends(get_db)):
     if not s.picture_file:
         raise HTTPException(status_code=404, detail="No picture for speaker")
 
-    path = SPEAKER_PHOTO_DIR / s.picture_file
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Picture file missing on disk")
-
-    return FileResponse(path=str(path))
+    return serve_file(SPEAKER_PHOTOS, s.picture_file, missing_detail="Picture file missing on disk")
 
 
 @app.post("/api/speakers/{speaker_id}/picture", response_model=SpeakerBase)
@@ -390,19 +651,14 @@ async def upload_speaker_picture(
 
     # delete old file if present
     if s.picture_file:
-        old_path = SPEAKER_PHOTO_DIR / s.picture_file
-        if old_path.exists():
-            old_path.unlink()
+        SPEAKER_PHOTOS.delete(s.picture_file)
 
     slug = normalize_name(s.name or "")
     filename = f"{slug}{ext}"
-    stored_path = SPEAKER_PHOTO_DIR / filename
-
-    with stored_path.open("wb") as f:
-        while chunk := await file.read(1024 * 1024):
-            f.write(chunk)
+    await save_upload(SPEAKER_PHOTOS, filename, file)
 
     s.picture_file = filename
+    publish(db, "speakers")  # same file name, the row may not change
     db.commit()
     db.refresh(s)
 
@@ -421,30 +677,62 @@ async def upload_speaker_picture(
 
 # ------- PARTICIPANTS ROUTES -------
 @app.get("/api/participants", response_model=list[ParticipantBase])
-def get_participants(db: Session = Depends(get_db)):
-    participants = db.query(Participant).all()
-
-    out = []
-    for p in participants:
-        events = (
-            db.query(Event)
-              .filter(Event.participants.any(Participant.id == p.id))
-              .all()
-        )
-        event_numbers = sorted([e.number for e in events if e.number is not None])
-
-        out.append({
-            "id": p.id,
-            "name": p.name,
-            "normalized_name": p.normalized_name,
-            "ktaname": p.ktaname,
-            "note": p.note,
-            "is_plusone": p.is_plusone,
-            "picture_file": p.picture_file,
-            "event_numbers": event_numbers,
-        })
-
-    return out
+def get_participants(limit: int | None = Query(None, ge=1, le=1000), offset: int = Query(0, ge=0),
+                     db: Session = Depends(get_db)):
+    return cached_list(f"participants?limit={limit}&offset={offset}", ["participants", "event_participant", "events"],
+                       ParticipantBase, lambda: list_participants(db, limit, offset))
+
+
+def list_participants(db: Session, limit: int | None = None, offset: int = 0) -> list[dict]:
+    """
+    By last then first name, like list_speakers
+    """
+    event_numbers = export.event_numbers_query(event_participant, event_participant.c.participant_id, Participant.id)
+    rows = db.execute(
+        select(Participant.id, Participant.name, Participant.normalized_name, Participant.ktaname,
+               Participant.note, Participant.is_plusone, Participant.picture_file,
+               event_numbers.label("event_numbers"))
+        .order_by(Participant.sort_last_name, Participant.sort_first_name, Participant.id)
+        .limit(limit).offset(offset)
+    ).mappings()
+    return [{**row, "event_numbers": row["event_numbers"] or []} for row in rows]
+
+
+@app.post("/api/participants/import", response_model=ImportReport)
+def import_participants_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    with text_upload(file) as f:
+        reader = csv.DictReader(f)
+        try:
+            check_columns(reader, "État civil")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        report = import_participants(db, reader)
+
+    db.commit()
+    return report
+
+
+def participant_pictures(db: Session) -> list[tuple[int, str]]:
+    return db.execute(
+        select(Participant.id, Participant.picture_file)
+        .where(Participant.picture_file.is_not(None))
+        .order_by(Participant.sort_last_name, Participant.sort_first_name, Participant.id)
+    ).all()
+
+
+@app.get("/api/participants/contact-sheet")
+def get_participants_contact_sheet(request: Request, db: Session = Depends(get_db)):
+    """
+    Where each participant's thumbnail is in the contact sheet image, like the speakers one
+    """
+    sheet = cached_contact_sheet("participants", PHOTOS, lambda: participant_pictures(db))
+    return contact_sheet_map(request, "participants", sheet)
+
+
+@app.get("/api/participants/contact-sheet.jpg")
+def get_participants_contact_sheet_image(request: Request, v: str | None = None, db: Session = Depends(get_db)):
+    sheet = cached_contact_sheet("participants", PHOTOS, lambda: participant_pictures(db))
+    return contact_sheet_image(request, sheet, v)
 
 
 @app.get("/api/participants/{participant_id}/picture")
@@ -456,11 +744,7 @@ def get_participant_picture(participant_id: int, db: Session = Depends(get_db)):
     if not p.picture_file:
         raise HTTPException(status_code=404, detail="No picture for participant")
 
-    path = PHOTO_DIR / p.picture_file
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="Picture file missing on disk")
-
-    return FileResponse(path=str(path))
+    return serve_file(PHOTOS, p.picture_file, missing_detail="Picture file missing on disk")
 
 
 @app.post("/api/participants", response_model=ParticipantBase)
@@ -470,7 +754,6 @@ def create_participant(payload: ParticipantCreate, db: Session = Depends(get_db)
         ktaname=payload.ktaname,
         note=payload.note,
         is_plusone=payload.is_plusone,
-        normalized_name=None,
         picture_file=None,
     )
     db.add(p)
@@ -510,16 +793,10 @@ async def upload_participant_picture(
 
     # delete old file if present
     if p.picture_file:
-        old_path = PHOTO_DIR / p.picture_file
-        if old_path.exists():
-            old_path.unlink()
+        PHOTOS.delete(p.picture_file)
 
     stored_name = f"{uuid.uuid4().hex}{ext}"
-    stored_path = PHOTO_DIR / stored_name
-
-    with stored_path.open("wb") as f:
-        while chunk := await file.read(1024 * 1024):
-            f.write(chunk)
+    await save_upload(PHOTOS, stored_name, file)
 
     p.picture_file = stored_name
     db.commit()
@@ -533,15 +810,21 @@ def delete_participant(participant_id: int, db: Session = Depends(get_db)):
     if not p:
         raise HTTPException(status_code=404, detail="Participant not found")
 
+    picture_file = p.picture_file
     db.delete(p)
     db.commit()
+
+    if picture_file:
+        PHOTOS.delete(picture_file)
+
     return {"ok": True}
 
 
 # ------ PROSPECTS ROUTES ------
 @app.get("/api/prospects", response_model=list[ProspectBase])
 def get_prospects(db: Session = Depends(get_db)):
-    return db.query(Prospect).order_by(Prospect.id.desc()).all()
+    return cached_list("prospects", ["prospects"], ProspectBase,
+                       lambda: db.query(Prospect).order_by(Prospect.id.desc()).all())
 
 
 @app.post("/api/prospects", response_model=ProspectBase)
@@ -553,6 +836,20 @@ def create_prospect(payload: ProspectCreate, db: Session = Depends(get_db)):
     return p
 
 
+@app.post("/api/prospects/import", response_model=ImportReport)
+def import_prospects_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    with text_upload(file) as f:
+        reader = prospect_reader(f)
+        try:
+            check_columns(reader, "Orateur/Oratrice")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        report = import_prospects(db, reader)
+
+    db.commit()
+    return report
+
+
 @app.put("/api/prospects/{prospect_id}", response_model=ProspectBase)
 def update_prospect(prospect_id: int, payload: ProspectUpdate, db: Session = Depends(get_db)):
     p = db.query(Prospect).filter(Prospect.id == prospect_id).first()
@@ -576,4 +873,103 @@ def delete_prospect(prospect_id: int, db: Session = Depends(get_db)):
 
     db.delete(p)
     db.commit()
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
+
+
+# ------ BATCH ROUTES ------
+@app.post("/api/batch", response_model=BatchResult)
+def run_batch(payload: BatchRequest, db: Session = Depends(get_db)):
+    """
+    All operations or none: the first one failing rolls back the batch, its index is in the error
+    """
+    try:
+        results, files = batch.run(db, payload.operations)
+    except batch.BatchError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail={"index": e.index, "detail": e.detail})
+    db.commit()
+
+    for storage, key in files:
+        storage.delete(key)
+
+    return {"results": results}
+
+
+# ------ SYNC ROUTES ------
+@app.get("/api/changes", response_model=ChangesFeed)
+def get_changes(since: int | None = Query(None, ge=0), db: Session = Depends(get_db)):
+    """
+    Rows changed and deleted since the token of a previous call, everything without one
+    """
+    return sync.changes_since(db, since)
+
+
+# ------ JOBS ROUTES ------
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# ------ STATS ROUTES ------
+# read from materialized views, up to stats.REFRESH_DELAY_SECONDS (plus the refresh) behind
+@app.get("/api/stats", response_model=StatsSummary)
+def get_stats_summary(db: Session = Depends(get_db)):
+    return stats.summary(db)
+
+
+@app.get("/api/stats/participants", response_model=list[ParticipantAttendance])
+def get_stats_participants(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0),
+                           db: Session = Depends(get_db)):
+    return stats.participants(db, limit, offset)
+
+
+@app.get("/api/stats/participants/{participant_id}", response_model=ParticipantAttendance)
+def get_stats_participant(participant_id: int, db: Session = Depends(get_db)):
+    row = stats.participant(db, participant_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    return row
+
+
+@app.get("/api/stats/speakers", response_model=list[SpeakerActivity])
+def get_stats_speakers(db: Session = Depends(get_db)):
+    return stats.speakers(db)
+
+
+@app.get("/api/stats/events", response_model=list[EventAttendance])
+def get_stats_events(db: Session = Depends(get_db)):
+    return stats.events(db)
+
+
+@app.get("/api/stats/years", response_model=list[YearAttendance])
+def get_stats_years(db: Session = Depends(get_db)):
+    return stats.years(db)
+
+
+# ------ EXPORT ROUTES ------
+@app.get("/api/export/data.zip")
+def export_data_zip():
+    """
+    Everything as a data/ folder, ready for seed.py
+    """
+    return StreamingResponse(
+        export.iter_data_zip(UPLOADS, PHOTOS, SPEAKER_PHOTOS, EVENT_PHOTOS),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="kadmin-data.zip"'},
+    )
+
+
+@app.get("/api/export/{table}")
+def export_table(table: str, format: Literal["ndjson", "csv"] = "ndjson"):
+    if table not in export.TABLES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export.iter_table(table, format),
+        media_type=f"{media_type}; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from typing import Any, List, Literal, Optional
 import datetime
 
 
@@ -51,12 +51,29 @@ class ParticipantMini(BaseModel):
 
 
 class EventDetail(EventBase):
+    story_html: Optional[str] = None
+    notes_html: Optional[str] = None
     participants: List[ParticipantMini] = []
     speaker: List[SpeakerBase] = []
 
     model_config = ConfigDict(from_attributes=True)
 
    
+class EventParticipantsSet(BaseModel):
+    participant_ids: List[int]
+
+
+class EventParticipantsPatch(BaseModel):
+    add: List[int] = []
+    remove: List[int] = []
+
+
+class EventParticipantsDiff(BaseModel):
+    participant_ids: List[int]
+    added: List[int]
+    removed: List[int]
+
+
 class ParticipantCreate(BaseModel):
     name: str
     ktaname: Optional[str] = None
@@ -98,4 +115,128 @@ class ProspectUpdate(BaseModel):
     response: Optional[str] = None
     domain: Optional[str] = None
     suggested_by: Optional[str] = None
-    remarks: Optional[str] = None
\ No newline at end of file
+    remarks: Optional[str] = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportReport(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    duplicates: int
+    skipped: int
+    links: int
+    errors: List[ImportRowError] = []
+
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime.datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ParticipantAttendance(BaseModel):
+    participant_id: int
+    name: Optional[str] = None
+    events_attended: int
+    first_event_number: Optional[int] = None
+    last_event_number: Optional[int] = None
+    last_event_date: Optional[datetime.date] = None
+
+
+class SpeakerActivity(BaseModel):
+    speaker_id: int
+    name: Optional[str] = None
+    events_given: int
+    first_event_number: Optional[int] = None
+    last_event_number: Optional[int] = None
+
+
+class EventAttendance(BaseModel):
+    event_id: int
+    number: int
+    title: str
+    date: Optional[datetime.date] = None
+    participants: int
+    speakers: int
+
+
+class YearAttendance(BaseModel):
+    year: int
+    events: int
+    attendances: int
+    distinct_participants: int
+    avg_participants: float
+    speakers_per_event: float
+
+
+class StatsSummary(BaseModel):
+    events: int
+    attendances: int
+    participants: int
+    speakers: int
+    avg_participants: Optional[float] = None
+    speakers_per_event: Optional[float] = None
+    refreshed_at: Optional[datetime.datetime] = None
+
+
+class EventCreate(BaseModel):
+    number: int
+    title: str
+    date: datetime.date
+    story: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class EventUpdate(BaseModel):
+    number: Optional[int] = None
+    title: Optional[str] = None
+    date: Optional[datetime.date] = None
+    story: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    table: Literal["participants", "prospects", "events"]
+    id: Optional[int] = None  # update and delete
+    data: dict[str, Any] = {}  # create and update, fields of the table's Create / Update schema
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    op: str
+    table: str
+    id: int
+
+
+class BatchResult(BaseModel):
+    results: List[BatchOperationResult]
+
+
+class ChangesFeed(BaseModel):
+    token: str
+    changed: dict[str, List[dict[str, Any]]]  # table -> rows, as in the table
+    deleted: dict[str, List[dict[str, Any]]]  # table -> keys, {"id": ...} or the association's pair
@@ -1,26 +1,22 @@
 import csv
-import datetime
 import os
-import re
 from pathlib import Path
 
 from db import SessionLocal, engine, Base
-from models import Event, Participant, Speaker, Prospect
+from models import Event, Speaker
 from sqlalchemy.exc import IntegrityError
 
-from utils import normalize_name
+from config import DATA_DIR, PHOTO_DIR, SPEAKER_PHOTO_DIR, EVENT_PHOTO_DIR, ALLOWED_PHOTO_EXTS
+from config import UPLOADS, PHOTOS, SPEAKER_PHOTOS, EVENT_PHOTOS
+from csv_import import import_participants, import_prospects, prospect_reader
+from render import render_event_texts
+
+from utils import normalize_name, parse_event_date, parse_event_info
 
-BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
 EVENTS_DIR = DATA_DIR / "descentes"
 PARTICIPANTS_CSV = DATA_DIR / "participants-participantes.csv"
 PROSPECTS_CSV = DATA_DIR / "orateurs-oratrices-potentiels.csv"
 
-PHOTO_DIR = DATA_DIR / "photos-trombi"
-SPEAKER_PHOTO_DIR = DATA_DIR / "photos-speakers"
-EVENT_PHOTO_DIR = DATA_DIR / "photos-events"
-ALLOWED_PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
-
 
 def find_event_cover_relpath(event_number: str) -> str | None:
     """
@@ -62,15 +58,7 @@ def create_speakers_and_events(db):
                         'script': None
                     }
                     with open(os.path.join(root, 'info')) as file_info:
-                        for line in file_info:
-                            parts = line.strip().split()
-                            info[parts[0]] = " ".join(parts[1:])
-
-                    if info['Date'] == 'Nuit du 21 au 22 décembre 2019':
-                        d, m, y = (21, 12, 2019)  # flemme
-                    else:
-                        date_parts = info['Date'].split('-')
-                        d, m, y = int(date_parts[0]), int(date_parts[1]), int(date_parts[2])
+                        info.update(parse_event_info(file_info))
 
                     # optional fields: story, notes, script
                     if 'recit.md' in files:
@@ -88,7 +76,9 @@ def create_speakers_and_events(db):
                         for filename in os.listdir(os.path.join(root, 'script')):
                             script_path = os.path.join(root, 'script', filename)
                             print(script_path)
-                            script_files.append(script_path)
+                            # local storage points to the file in data/, S3 gets a copy
+                            key = f"descentes/{name}/script/{filename}"
+                            script_files.append(UPLOADS.adopt(key, Path(script_path)))
                         info['script'] = script_files
 
                     # pprint(info)
@@ -97,30 +87,36 @@ def create_speakers_and_events(db):
                     speaker_name = info["Orateur"].strip()
                     speaker_slug = normalize_name(speaker_name, origin="freeform")
                     speaker_photo_path = speaker_photo_index.get(speaker_slug)
+                    speaker_picture = None
+                    if speaker_photo_path:
+                        speaker_picture = SPEAKER_PHOTOS.adopt(speaker_photo_path.name, speaker_photo_path)
 
                     speaker = Speaker(
                         name=speaker_name,
                         ktaname=info["Pseudo"],
                         labo=info["Labo"],
-                        picture_file=(speaker_photo_path.name if speaker_photo_path else None),
+                        picture_file=speaker_picture,
                     )
                     db.add(speaker)
                     db.commit()
 
                     event_number = info["number"]
                     cover_photo = find_event_cover_relpath(event_number)
+                    if cover_photo:
+                        cover_photo = EVENT_PHOTOS.adopt(cover_photo, EVENT_PHOTO_DIR / cover_photo)
 
                     # create event with speaker
                     event = Event(
                         number=int(info['number']),
                         title=info['Titre'],
-                        date=datetime.date(y, m, d),
+                        date=parse_event_date(info['Date']),
                         story=info['story'],
                         notes=info['notes'],
                         cover_photo=cover_photo,
                         script_files=info['script'],
                         speaker=[speaker]
                     )
+                    render_event_texts(event)
                     db.add(event)
                     db.commit()
                     break
@@ -161,43 +157,14 @@ def build_speaker_photo_index(photo_dir: Path) -> dict[str, Path]:
 # Part 2: add participants - retro add participants to previously created events
 def create_participants(db):
     photo_index = build_photo_index(PHOTO_DIR)
-    events_by_number = {e.number: e for e in db.query(Event).all()}
-
-    with open(PARTICIPANTS_CSV, 'r') as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            name = row['État civil'].strip()
-            normalized_name = normalize_name(name)
-            pseudo = row['Pseudo'].strip()
-            note = row['Relation aux ordanisateurs'].strip()
-            plusone = row["Est un +1 de l'orateur"].strip() == "1"
-            event_ids = row['Descentes'].strip()
-
-            # find photo if exists
-            picture_filepath = photo_index.get(normalized_name)
-
-            # create participant if doesn't already exist
-            participant = (db.query(Participant).filter(Participant.normalized_name == normalized_name).first())
-            if participant is None:
-                participant = Participant(name=name,
-                                          normalized_name=normalized_name,
-                                          ktaname=pseudo,
-                                          note=note,
-                                          is_plusone=plusone,
-                                          picture_file=(picture_filepath.name if picture_filepath else None))
-                db.add(participant)
-                db.flush()
-
-            # link to events
-            if event_ids:
-                event_numbers = [int(x.strip()) for x in event_ids.split(',')]
-                for event_number in event_numbers:
-                    event = events_by_number.get(event_number)
-                    if event and participant not in event.participants:
-                        event.participants.append(participant)
-
-        db.commit()
+    for path in photo_index.values():
+        PHOTOS.adopt(path.name, path)
+
+    with open(PARTICIPANTS_CSV, 'r', newline='') as csvfile:
+        report = import_participants(db, csv.DictReader(csvfile), photo_index=photo_index)
+
+    db.commit()
+    print(f"[seed] participants: {report}")
 
 
 def create_prospects(db):
@@ -205,40 +172,11 @@ def create_prospects(db):
         print(f"[seed] prospects CSV not found: {PROSPECTS_CSV}")
         return
 
-    with open(PROSPECTS_CSV, "r") as f:
-        reader = csv.DictReader(f)
-
-        # strip *...*
-        def norm_cell(h: str) -> str:
-            h = (h or "").strip()
-            h = re.sub(r"^\*+|\*+$", "", h)
-            return h
-
-        reader.fieldnames = [norm_cell(h) for h in reader.fieldnames]
-
-        for row in reader:
-            name = norm_cell(row.get("Orateur/Oratrice"))
-            if not name:
-                continue
-
-            approached = row.get("Approché.e")
-            response = row.get("Réponse")
-            domain = row.get("Domaine")
-            suggested_by = row.get("Suggéré par")
-            remarks = row.get("Remarques")
-
-            db.add(
-                Prospect(
-                    name=name,
-                    approached=approached,
-                    response=response,
-                    domain=domain,
-                    suggested_by=suggested_by,
-                    remarks=remarks,
-                )
-            )
-
-        db.commit()
+    with open(PROSPECTS_CSV, "r", newline='') as f:
+        report = import_prospects(db, prospect_reader(f))
+
+    db.commit()
+    print(f"[seed] prospects: {report}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+"""
+Attendance statistics, precomputed in materialized views. They are created with the tables
+(reset_db.py / seed.py) and refreshed by the refresh_stats job, which triggers on the
+underlying tables enqueue after writes: a burst of writes gives a single refresh.
+"""
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import Session
+
+from db import Base
+
+# writes are batched into one refresh running this long after the first of them
+REFRESH_DELAY_SECONDS = 10
+REFRESH_JOB = "refresh_stats"
+
+# name -> (query, unique index columns). REFRESH ... CONCURRENTLY needs a unique index,
+# so that readers are never blocked during a refresh
+VIEWS = {
+    "participant_attendance": ("""
+        SELECT p.id AS participant_id, p.name,
+               count(DISTINCT e.id) AS events_attended,
+               min(e.number) AS first_event_number,
+               max(e.number) AS last_event_number,
+               max(e.date) AS last_event_date
+        FROM participants p
+        LEFT JOIN event_participant ep ON ep.participant_id = p.id
+        LEFT JOIN events e ON e.id = ep.event_id
+        GROUP BY p.id, p.name
+    """, "participant_id"),
+    "speaker_activity": ("""
+        SELECT s.id AS speaker_id, s.name,
+               count(DISTINCT e.id) AS events_given,
+               min(e.number) AS first_event_number,
+               max(e.number) AS last_event_number
+        FROM speakers s
+        LEFT JOIN event_speaker es ON es.speaker_id = s.id
+        LEFT JOIN events e ON e.id = es.event_id
+        GROUP BY s.id, s.name
+    """, "speaker_id"),
+    "event_attendance": ("""
+        SELECT e.id AS event_id, e.number, e.title, e.date,
+               (SELECT count(DISTINCT ep.participant_id)
+                FROM event_participant ep WHERE ep.event_id = e.id) AS participants,
+               (SELECT count(DISTINCT es.speaker_id)
+                FROM event_speaker es WHERE es.event_id = e.id) AS speakers
+        FROM events e
+    """, "event_id"),
+    "yearly_attendance": ("""
+        WITH per_event AS (
+            SELECT e.id, extract(year FROM e.date)::int AS year,
+                   (SELECT count(DISTINCT ep.participant_id)
+                    FROM event_participant ep WHERE ep.event_id = e.id) AS participants,
+                   (SELECT count(DISTINCT es.speaker_id)
+                    FROM event_speaker es WHERE es.event_id = e.id) AS speakers
+            FROM events e
+            WHERE e.date IS NOT NULL
+        )
+        SELECT pe.year,
+               count(*) AS events,
+               sum(pe.participants)::int AS attendances,
+               (SELECT count(DISTINCT ep.participant_id)
+                FROM event_participant ep JOIN events e ON e.id = ep.event_id
+                WHERE extract(year FROM e.date)::int = pe.year) AS distinct_participants,
+               round(avg(pe.participants), 2)::float AS avg_participants,
+               round(sum(pe.speakers)::numeric / count(*), 2)::float AS speakers_per_event
+        FROM per_event pe
+        GROUP BY pe.year
+    """, "year"),
+}
+# any write to these can change a view
+SOURCE_TABLES = ["events", "participants", "speakers", "event_participant", "event_speaker"]
+
+for _name, (_query, _key) in VIEWS.items():
+    event.listen(Base.metadata, "after_create", DDL(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {_name} AS {_query}"))
+    event.listen(Base.metadata, "after_create", DDL(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{_name}_{_key} ON {_name} ({_key})"
+    ))
+    # views depend on the tables, they go first
+    event.listen(Base.metadata, "before_drop", DDL(f"DROP MATERIALIZED VIEW IF EXISTS {_name}"))
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_participant_attendance_top "
+    "ON participant_attendance (events_attended DESC, participant_id)"
+))
+
+# statement-level, inside the writing transaction: the job exists iff the write commits.
+# A refresh already queued absorbs later writes (jobs.enqueue's dedupe key, same partial index)
+event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION enqueue_stats_refresh() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO jobs (kind, run_after, dedupe_key)
+    VALUES ('{REFRESH_JOB}', now() + interval '{REFRESH_DELAY_SECONDS} seconds', '{REFRESH_JOB}')
+    ON CONFLICT (dedupe_key) WHERE status = 'queued' AND dedupe_key IS NOT NULL DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""))
+for _table in SOURCE_TABLES:
+    event.listen(Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER {_table}_stats_refresh
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {_table}
+FOR EACH STATEMENT EXECUTE FUNCTION enqueue_stats_refresh()
+"""))
+event.listen(Base.metadata, "before_drop", DDL("DROP FUNCTION IF EXISTS enqueue_stats_refresh() CASCADE"))
+
+
+def refresh(db: Session) -> None:
+    for name in VIEWS:
+        db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+
+
+def _rows(db: Session, sql: str, **params) -> list[dict]:
+    return [dict(row) for row in db.execute(text(sql), params).mappings()]
+
+
+def participants(db: Session, limit: int, offset: int) -> list[dict]:
+    """
+    Most frequent attendees first
+    """
+    return _rows(db, """
+        SELECT * FROM participant_attendance
+        ORDER BY events_attended DESC, participant_id
+        LIMIT :limit OFFSET :offset
+    """, limit=limit, offset=offset)
+
+
+def participant(db: Session, participant_id: int) -> dict | None:
+    rows = _rows(db, "SELECT * FROM participant_attendance WHERE participant_id = :id", id=participant_id)
+    return rows[0] if rows else None
+
+
+def speakers(db: Session) -> list[dict]:
+    return _rows(db, "SELECT * FROM speaker_activity ORDER BY events_given DESC, speaker_id")
+
+
+def events(db: Session) -> list[dict]:
+    return _rows(db, "SELECT * FROM event_attendance ORDER BY number")
+
+
+def years(db: Session) -> list[dict]:
+    return _rows(db, "SELECT * FROM yearly_attendance ORDER BY year")
+
+
+def summary(db: Session) -> dict:
+    row = db.execute(text(f"""
+        SELECT
+            (SELECT count(*) FROM event_attendance) AS events,
+            (SELECT coalesce(sum(participants), 0) FROM event_attendance)::int AS attendances,
+            (SELECT count(*) FROM participant_attendance WHERE events_attended > 0) AS participants,
+            (SELECT count(*) FROM speaker_activity WHERE events_given > 0) AS speakers,
+            (SELECT round(avg(participants), 2)::float FROM event_attendance) AS avg_participants,
+            (SELECT round(sum(speakers)::numeric / nullif(count(*), 0), 2)::float FROM event_attendance)
+                AS speakers_per_event,
+            (SELECT max(finished_at) FROM jobs WHERE kind = '{REFRESH_JOB}' AND status = 'succeeded')
+                AS refreshed_at
+    """)).mappings().one()
+    return dict(row)
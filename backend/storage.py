@@ -0,0 +1,271 @@
+import mimetypes
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, Iterator
+from urllib.parse import quote
+
+CHUNK_SIZE = 1024 * 1024
+# S3 uploads above this go multipart, this many bytes per part
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+PRESIGN_EXPIRES = 15 * 60
+
+
+def check_key(key: str) -> str:
+    """
+    Keys are relative posix paths, they must stay inside the storage
+    """
+    path = PurePosixPath(key)
+    if not key or path.is_absolute() or ".." in path.parts:
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return path.as_posix()
+
+
+class Storage(ABC):
+    """
+    Where uploaded files and photos live. Files are addressed by key, the names stored in
+    the DB (script_files, picture_file, cover_photo). Two implementations: LocalStorage
+    (a directory) and S3Storage (a bucket prefix, works with any S3-compatible server).
+    """
+
+    @abstractmethod
+    def save(self, key: str, src: BinaryIO) -> None:
+        """
+        Streams src to key, replacing any existing file
+        """
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """
+        Readable binary file object, use it as a context manager. FileNotFoundError if missing.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        No error if the file is already gone
+        """
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def move(self, src_key: str, dest_key: str) -> None:
+        ...
+
+    @abstractmethod
+    def scan(self) -> Iterator[tuple[str, int, float]]:
+        """
+        Yields (key, size, mtime) for every file
+        """
+
+    def versions(self, keys: Iterable[str]) -> dict[str, tuple[int, float]]:
+        """
+        (size, mtime) of those keys that exist, changing whenever the file is replaced.
+        One listing of the whole storage, implementations that can look keys up do so.
+        """
+        wanted = set(keys)
+        return {key: (size, mtime) for key, size, mtime in self.scan() if key in wanted}
+
+    @abstractmethod
+    def adopt(self, key: str, path: Path) -> str:
+        """
+        Makes a file from the local disk available, for seed.py. Returns the name to store.
+        """
+
+    def local_path(self, key: str) -> Path | None:
+        """
+        Path on this machine's disk, None for remote storages
+        """
+        return None
+
+    def url(self, key: str, filename: str | None = None) -> str | None:
+        """
+        Presigned URL clients can download from directly, None if the storage can't do that
+        """
+        return None
+
+    def chunks(self, key: str) -> Iterator[bytes]:
+        with self.open(key) as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+
+    def content(self, key: str) -> Path | Iterator[bytes]:
+        """
+        For zipstream.iter_zip: the file on disk when there is one, else its bytes
+        """
+        return self.local_path(key) or self.chunks(key)
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def __str__(self):
+        return str(self.root)
+
+    def _path(self, key: str) -> Path:
+        # seeded scripts are stored as absolute paths into data/descentes/: readable, never written
+        if Path(key).is_absolute():
+            return Path(key)
+        return self.root / check_key(key)
+
+    def save(self, key: str, src: BinaryIO) -> None:
+        final = self.root / check_key(key)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        # written aside then renamed, readers never see a partial file
+        tmp = final.with_name(f".{final.name}.{uuid.uuid4().hex}.part")
+        try:
+            with tmp.open("wb") as f:
+                shutil.copyfileobj(src, f, CHUNK_SIZE)
+            os.replace(tmp, final)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return self._path(key).open("rb")
+
+    def delete(self, key: str) -> None:
+        (self.root / check_key(key)).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def move(self, src_key: str, dest_key: str) -> None:
+        dest = self.root / check_key(dest_key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.root / check_key(src_key), dest)
+
+    def scan(self) -> Iterator[tuple[str, int, float]]:
+        # os.scandir gets the file type from the directory listing itself
+        stack = [self.root]
+        while stack:
+            folder = stack.pop()
+            try:
+                it = os.scandir(folder)
+            except FileNotFoundError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        yield Path(entry.path).relative_to(self.root).as_posix(), st.st_size, st.st_mtime
+
+    def versions(self, keys: Iterable[str]) -> dict[str, tuple[int, float]]:
+        # a stat each, and seeded absolute keys are not in scan()
+        out = {}
+        for key in keys:
+            try:
+                st = self._path(key).stat()
+            except FileNotFoundError:
+                continue
+            out[key] = (st.st_size, st.st_mtime)
+        return out
+
+    def adopt(self, key: str, path: Path) -> str:
+        # no copy: inside the root it's already there, outside it is pointed to
+        path = path.resolve()
+        if path.is_relative_to(self.root.resolve()):
+            return path.relative_to(self.root.resolve()).as_posix()
+        return str(path)
+
+    def local_path(self, key: str) -> Path | None:
+        return self._path(key)
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None,
+                 public_endpoint_url: str | None = None, client=None):
+        # optional dependency, only needed with STORAGE_BACKEND=s3
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket
+        self.prefix = prefix
+        # credentials and region from the usual AWS_* environment variables
+        self.client = client or boto3.client("s3", endpoint_url=endpoint_url)
+        # presigned URLs are signed for the host clients will reach, e.g. localhost:9000 rather than minio:9000
+        self.presign_client = self.client
+        if public_endpoint_url:
+            self.presign_client = boto3.client("s3", endpoint_url=public_endpoint_url)
+        self.transfer = TransferConfig(multipart_threshold=MULTIPART_CHUNK_SIZE,
+                                       multipart_chunksize=MULTIPART_CHUNK_SIZE)
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def _key(self, key: str) -> str:
+        return self.prefix + check_key(key)
+
+    def _extra_args(self, key: str) -> dict:
+        media_type, _ = mimetypes.guess_type(key)
+        return {"ContentType": media_type} if media_type else {}
+
+    def save(self, key: str, src: BinaryIO) -> None:
+        # managed transfer: multipart upload part by part, never the whole file in memory
+        self.client.upload_fileobj(src, self.bucket, self._key(key), ExtraArgs=self._extra_args(key),
+                                   Config=self.transfer)
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def move(self, src_key: str, dest_key: str) -> None:
+        # server-side copy, the bytes don't come back through us
+        self.client.copy({"Bucket": self.bucket, "Key": self._key(src_key)}, self.bucket, self._key(dest_key),
+                         Config=self.transfer)
+        self.delete(src_key)
+
+    def scan(self) -> Iterator[tuple[str, int, float]]:
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix)
+        for page in pages:
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp()
+
+    def adopt(self, key: str, path: Path) -> str:
+        self.client.upload_file(str(path), self.bucket, self._key(key), ExtraArgs=self._extra_args(key),
+                                Config=self.transfer)
+        return check_key(key)
+
+    def url(self, key: str, filename: str | None = None) -> str | None:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+        return self.presign_client.generate_presigned_url("get_object", Params=params, ExpiresIn=PRESIGN_EXPIRES)
+
+
+def make_storage(backend: str, name: str, local_dir: Path, bucket: str | None = None,
+                 endpoint_url: str | None = None, public_endpoint_url: str | None = None) -> Storage:
+    """
+    local: files in local_dir. s3: objects under name/ in the bucket.
+    """
+    if backend == "local":
+        return LocalStorage(local_dir)
+    if backend == "s3":
+        if not bucket:
+            raise ValueError("S3_BUCKET is required with STORAGE_BACKEND=s3")
+        return S3Storage(bucket, prefix=f"{name}/", endpoint_url=endpoint_url, public_endpoint_url=public_endpoint_url)
+    raise ValueError(f"Unknown storage backend {backend!r}")
@@ -0,0 +1,46 @@
+"""
+Delta feed for clients keeping a local copy of the tables: GET /api/changes?since=<token>
+answers the rows written and the keys deleted since the token was handed out, and a new token.
+
+Rows carry the id of the transaction that last wrote them (revision, set by trigger) and
+deletes leave a tombstone with the same. The token is the xmin of a snapshot taken before
+reading: every transaction below it had finished, so nothing written later can get a smaller
+revision. A row may be sent twice (written by a transaction still running at the previous poll
+but already visible to it), so clients apply the feed idempotently: deletions first, then rows.
+"""
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from db import Base
+from models import TRACKED_TABLES, Tombstone
+
+
+def current_token(db: Session) -> int:
+    return db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar_one()
+
+
+def changes_since(db: Session, since: int | None) -> dict:
+    """
+    Everything when since is None, for a first sync
+    """
+    token = current_token(db)
+
+    changed = {}
+    for name in TRACKED_TABLES:
+        table = Base.metadata.tables[name]
+        stmt = select(table).order_by(table.c.revision)
+        if since is not None:
+            stmt = stmt.where(table.c.revision >= since)
+        changed[name] = [dict(row) for row in db.execute(stmt).mappings()]
+
+    deleted = {name: [] for name in TRACKED_TABLES}
+    if since is not None:
+        stmt = (
+            select(Tombstone.table_name, Tombstone.row_key)
+            .where(Tombstone.revision >= since)
+            .order_by(Tombstone.revision, Tombstone.id)
+        )
+        for table_name, row_key in db.execute(stmt):
+            deleted[table_name].append(row_key)
+
+    return {"token": str(token), "changed": changed, "deleted": deleted}
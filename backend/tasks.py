@@ -0,0 +1,99 @@
+"""
+Job handlers, run by worker.py. Enqueue them with jobs.enqueue(db, "<kind>", payload).
+"""
+import datetime
+import os
+import shutil
+import tempfile
+
+from sqlalchemy.orm import Session
+
+from config import UPLOADS, SPEAKER_PHOTOS, EVENT_PHOTOS
+from event_import import import_event_zip
+from jobs import PermanentError, handler
+from models import Event
+from reconcile import DEFAULT_GRACE, reconcile
+from render import render_event_texts
+from rerender import rerender_events
+import stats
+from storage import CHUNK_SIZE
+
+
+@handler("render_event")
+def render_event(db: Session, payload: dict):
+    ev = db.get(Event, payload["event_id"])
+    if ev is None:
+        return {"rendered": False}  # deleted in the meantime
+
+    rendered = render_event_texts(ev)
+    db.commit()
+    return {"rendered": rendered}
+
+
+@handler("rerender_events")
+def rerender_all_events(db: Session, payload: dict):
+    return {"rendered": rerender_events(db, force=payload.get("force", False))}
+
+
+@handler("import_event_zip")
+def import_event(db: Session, payload: dict):
+    """
+    payload: {"key": staged upload in UPLOADS, "number": optional event number}
+    """
+    key = payload["key"]
+    if not UPLOADS.exists(key):
+        raise PermanentError("Staged archive is gone")
+
+    # zipfile needs to seek: remote archives are downloaded first
+    with tempfile.TemporaryFile() as tmp:
+        path = UPLOADS.local_path(key)
+        if path is None:
+            with UPLOADS.open(key) as src:
+                shutil.copyfileobj(src, tmp, CHUNK_SIZE)
+            tmp.seek(0)
+
+        with (path.open("rb") if path is not None else tmp) as archive:
+            try:
+                ev = import_event_zip(db, archive, UPLOADS, SPEAKER_PHOTOS, EVENT_PHOTOS,
+                                      number=payload.get("number"))
+            except ValueError as e:
+                db.rollback()
+                UPLOADS.delete(key)
+                raise PermanentError(str(e))
+
+    UPLOADS.delete(key)
+    return {"event_id": ev.id, "number": ev.number}
+
+
+@handler("reconcile_storage")
+def reconcile_storage(db: Session, payload: dict):
+    """
+    payload: {"delete": bool, "grace_hours": float}, both optional.
+    Scheduled by worker.py; only reports unless RECONCILE_DELETE=1 or payload says so.
+    """
+    delete = payload.get("delete", os.environ.get("RECONCILE_DELETE") == "1")
+    grace = datetime.timedelta(hours=payload["grace_hours"]) if "grace_hours" in payload else DEFAULT_GRACE
+
+    report = reconcile(db, delete=delete, grace=grace)
+    for root, r in report.items():
+        if r["orphans"] or r["missing"]:
+            print(f"[reconcile] {root}: {len(r['orphans'])} orphans, {r['deleted']} deleted, "
+                  f"{len(r['missing'])} missing")
+    return report
+
+
+@handler(stats.REFRESH_JOB)
+def refresh_stats(db: Session, payload: dict):
+    stats.refresh(db)
+    return {"views": list(stats.VIEWS)}
+
+
+@handler("seed")
+def seed(db: Session, payload: dict):
+    # imported here: seed.py reads data/ paths that only matter for this job
+    from seed import create_participants, create_prospects, create_speakers_and_events
+
+    create_speakers_and_events(db)
+    create_participants(db)
+    create_prospects(db)
+    return {"seeded": True}
@@ -0,0 +1,46 @@
+import io
+import zipfile
+
+from event_import import MAX_UNCOMPRESSED_SIZE, _entries
+
+
+def make_zip(names: list[str]) -> zipfile.ZipFile:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name in names:
+            zf.writestr(name, b"x")
+    return zipfile.ZipFile(buf)
+
+
+def rejected(zf: zipfile.ZipFile) -> str:
+    try:
+        _entries(zf)
+    except ValueError as e:
+        return str(e)
+    raise AssertionError("archive accepted")
+
+
+# event files inside a single NN-xxx/ folder, the number comes from its name
+folder, entries = _entries(make_zip(["12-foo/info", "12-foo/recit.md", "12-foo/script/a.pdf", "__MACOSX/12-foo/._info",
+                                     "12-foo/.DS_Store"]))
+assert folder == "12-foo"
+assert int(folder.split("-")[0]) == 12
+assert sorted(entries) == ["info", "recit.md", "script/a.pdf"]
+
+# or at the root
+folder, entries = _entries(make_zip(["info", "script/a.pdf"]))
+assert folder == ""
+assert sorted(entries) == ["info", "script/a.pdf"]
+
+# several folders is not one event folder
+folder, entries = _entries(make_zip(["12-foo/info", "13-bar/info"]))
+assert folder == ""
+assert sorted(entries) == ["12-foo/info", "13-bar/info"]
+
+assert rejected(make_zip(["/etc/passwd"])) == "Invalid path in archive: /etc/passwd"
+assert rejected(make_zip(["12-foo/../../info"])) == "Invalid path in archive: 12-foo/../../info"
+
+# the sizes are taken from the archive's headers, not from extracting
+zf = make_zip(["12-foo/info", "12-foo/script/a.pdf"])
+zf.getinfo("12-foo/script/a.pdf").file_size = MAX_UNCOMPRESSED_SIZE
+assert rejected(zf) == "Archive too large once extracted"
@@ -1,4 +1,4 @@
-from utils import normalize_name
+from utils import name_sort_keys, normalize_name, photo_filename_stem
 
 assert normalize_name('Lucas Roger-Loir', origin="freeform") == "lucas_roger-loir"
 assert normalize_name('Lucie Durand', origin="freeform") == "lucie_durand"
@@ -6,4 +6,13 @@ assert normalize_name('Émilie du Châtelet', origin="freeform") == "emilie_du-c
 assert normalize_name('Machin de Truc', origin="freeform") == "machin_de-truc"
 assert normalize_name('Jean-Charles Bidule-Truc', origin="freeform") == "jean-charles_bidule-truc"
 assert normalize_name('abel-laval', origin="filename") == "abel_laval"
-assert normalize_name('machine-al_truc', origin="filename") == "machine_al-truc"
\ No newline at end of file
+assert normalize_name('machine-al_truc', origin="filename") == "machine_al-truc"
+
+assert photo_filename_stem("emilie_du-chatelet") == "emilie-du_chatelet"
+assert photo_filename_stem("jean-charles_bidule-truc") == "jean_charles-bidule_truc"
+assert normalize_name(photo_filename_stem("jean-charles_bidule-truc"), origin="filename") == "jean-charles_bidule-truc"
+
+assert name_sort_keys("Émilie du Châtelet") == ("du-chatelet", "emilie")
+assert name_sort_keys("Haëtham Al Aswad") == ("al-aswad", "haetham")
+assert name_sort_keys(" Platon ") == ("platon", "")
+assert name_sort_keys(None) == ("", "")
@@ -0,0 +1,17 @@
+from render import render_markdown
+
+assert render_markdown("<script>alert(1)</script>") == "<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>\n"
+assert "<a" not in render_markdown('<a href="javascript:alert(1)">x</a>')
+
+assert render_markdown("[x](javascript:alert(1))") == "<p>[x](javascript:alert(1))</p>\n"
+assert render_markdown("[x](JavaScript:alert(1))") == "<p>[x](JavaScript:alert(1))</p>\n"
+assert 'href="https://example.org"' in render_markdown("[x](https://example.org)")
+
+assert render_markdown(r"$\text{<img src=x onerror=alert(1)>}$") == (
+    '<p><span class="math inline">'
+    '<code class="math-error">\\text{&lt;img src=x onerror=alert(1)&gt;}</code>'
+    '</span></p>\n'
+)
+assert "<msup>" in render_markdown("$x^2$")
+
+assert render_markdown("$5 and $10") == "<p>$5 and $10</p>\n"
@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+import urllib.request
+from pathlib import Path
+
+from storage import LocalStorage, S3Storage, Storage, check_key
+
+
+def check(storage):
+    storage.save("a/b.txt", io.BytesIO(b"hello"))
+    assert storage.exists("a/b.txt")
+    assert not storage.exists("a/nope.txt")
+    with storage.open("a/b.txt") as f:
+        assert f.read() == b"hello"
+
+    # above the multipart threshold
+    big = os.urandom(9 * 1024 * 1024)
+    storage.save("big.bin", io.BytesIO(big))
+    assert b"".join(storage.chunks("big.bin")) == big
+
+    storage.move("a/b.txt", "c.txt")
+    assert not storage.exists("a/b.txt") and storage.exists("c.txt")
+    assert {(key, size) for key, size, _ in storage.scan()} == {("c.txt", 5), ("big.bin", len(big))}
+    assert {key: size for key, (size, _) in storage.versions(["c.txt", "nope.txt"]).items()} == {"c.txt": 5}
+
+    storage.delete("c.txt")
+    storage.delete("c.txt")
+    storage.delete("big.bin")
+    assert not storage.exists("c.txt")
+    assert list(storage.scan()) == []
+
+
+class Incomplete(Storage):
+    pass
+
+
+try:
+    Incomplete()
+except TypeError:
+    pass
+else:
+    raise AssertionError("a backend missing methods can be instantiated")
+
+for key in ["", "/etc/passwd", "../x", "a/../../x"]:
+    try:
+        check_key(key)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(key)
+
+with tempfile.TemporaryDirectory() as tmp:
+    local = LocalStorage(Path(tmp) / "uploads")
+    check(local)
+    assert local.url("c.txt") is None
+    outside = Path(tmp) / "seed.pdf"
+    assert local.adopt("seed.pdf", outside) == str(outside.resolve())
+    assert local.adopt("x.jpg", local.root / "x.jpg") == "x.jpg"
+
+# against MinIO: docker compose -f docker-compose-dev.yml --profile s3 up -d minio, then
+# S3_TEST_ENDPOINT_URL=http://localhost:9000 AWS_ACCESS_KEY_ID=minio AWS_SECRET_ACCESS_KEY=minio-password \
+#     python test_storage.py
+if os.environ.get("S3_TEST_ENDPOINT_URL"):
+    s3 = S3Storage(os.environ.get("S3_TEST_BUCKET", "kadmin-test"), prefix="test-storage/",
+                   endpoint_url=os.environ["S3_TEST_ENDPOINT_URL"])
+    try:
+        s3.client.create_bucket(Bucket=s3.bucket)
+    except s3.client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    for key, _, _ in s3.scan():  # leftovers from an interrupted run
+        s3.delete(key)
+    check(s3)
+    s3.save("doc.pdf", io.BytesIO(b"%PDF"))
+    with urllib.request.urlopen(s3.url("doc.pdf", filename="script.pdf")) as response:
+        assert response.read() == b"%PDF"
+        assert "script.pdf" in response.headers["Content-Disposition"]
+    s3.delete("doc.pdf")
@@ -1,6 +1,7 @@
+import datetime
 import re
 import unicodedata
-from typing import Literal
+from typing import Iterable, Literal
 
 NameOrigin = Literal["freeform", "filename"]
 
@@ -38,4 +39,59 @@ def normalize_name(name: str, origin: NameOrigin = "freeform") -> str:
         first, last = name.split('-', 1)
         first = first.replace("_", "-")
         last = last.replace("_", "-")
-        return f"{first}_{last}"
\ No newline at end of file
+        return f"{first}_{last}"
+
+
+def name_sort_keys(name: str | None) -> tuple[str, str]:
+    """
+    (last name, first name) to sort people by, split and folded like normalize_name:
+    Émilie du Châtelet -> ("du-chatelet", "emilie")
+    Platon -> ("platon", "")
+    """
+    if not name or not name.strip():
+        return "", ""
+
+    first, _, last = normalize_name(name).partition("_")
+    if not last:
+        return first, ""
+    return last, first
+
+
+def photo_filename_stem(normalized_name: str) -> str:
+    """
+    Inverse of normalize_name(..., origin="filename"), to write photos the way
+    photos-trombi/ names them:
+    emilie_du-chatelet -> emilie-du_chatelet
+    """
+    if "_" not in normalized_name:
+        return normalized_name
+
+    first, last = normalized_name.split("_", 1)
+    return f"{first.replace('-', '_')}-{last.replace('-', '_')}"
+
+
+def parse_event_info(lines: Iterable[str]) -> dict[str, str]:
+    """
+    Parses the `info` file of an event folder, one "Key value" per line:
+    Titre La conjecture de machin
+    Date 21-12-2019
+    Orateur Émilie du Châtelet
+    """
+    info = {}
+    for line in lines:
+        parts = line.strip().split()
+        if not parts:
+            continue
+        info[parts[0]] = " ".join(parts[1:])
+    return info
+
+
+def parse_event_date(value: str) -> datetime.date:
+    """
+    dd-mm-yyyy from the info file
+    """
+    if value == 'Nuit du 21 au 22 décembre 2019':
+        return datetime.date(2019, 12, 21)  # flemme
+
+    d, m, y = (int(x) for x in value.split('-'))
+    return datetime.date(y, m, d)
@@ -0,0 +1,83 @@
+import datetime
+import json
+import signal
+import sys
+import threading
+
+from db import SessionLocal
+import jobs
+import tasks  # noqa: F401, registers the job handlers
+
+POLL_INTERVAL = 1.0
+REAPER_INTERVAL = 60.0
+
+# (kind, every, payload), enqueued by whichever worker notices first
+SCHEDULE = [
+    ("reconcile_storage", datetime.timedelta(days=1), {}),
+]
+
+
+def work(stop: threading.Event):
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = jobs.claim(db)
+            if job is None:
+                stop.wait(POLL_INTERVAL)
+                continue
+            jobs.run(db, job)
+        except Exception as e:
+            # DB unreachable and such: don't let the thread die
+            print(f"[worker] {e!r}")
+            stop.wait(POLL_INTERVAL)
+        finally:
+            db.close()
+
+
+def reap(stop: threading.Event):
+    """
+    Housekeeping: requeues jobs of dead workers, enqueues scheduled jobs
+    """
+    while not stop.wait(REAPER_INTERVAL):
+        db = SessionLocal()
+        try:
+            requeued = jobs.requeue_stale(db)
+            if requeued:
+                print(f"[worker] requeued {requeued} stale jobs")
+
+            for kind, every, payload in SCHEDULE:
+                jobs.enqueue_periodic(db, kind, every, payload)
+            db.commit()
+        except Exception as e:
+            print(f"[worker] {e!r}")
+        finally:
+            db.close()
+
+
+def main(concurrency: int):
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    threads = [threading.Thread(target=work, args=(stop,), name=f"worker-{i}") for i in range(concurrency)]
+    threads.append(threading.Thread(target=reap, args=(stop,), name="reaper"))
+    for t in threads:
+        t.start()
+    print(f"[worker] running {concurrency} jobs at a time, handlers: {sorted(jobs.HANDLERS)}")
+
+    # running jobs finish before exiting
+    for t in threads:
+        t.join()
+
+
+if __name__ == '__main__':
+    # python worker.py [concurrency]
+    # python worker.py enqueue <kind> ['{"json": "payload"}']
+    if sys.argv[1:2] == ["enqueue"]:
+        db = SessionLocal()
+        job_id = jobs.enqueue(db, sys.argv[2], json.loads(sys.argv[3]) if len(sys.argv) > 3 else {})
+        db.commit()
+        db.close()
+        print(f"Enqueued job #{job_id}")
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
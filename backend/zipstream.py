@@ -0,0 +1,57 @@
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+ZipContent = bytes | Path | Iterable[bytes]
+
+
+class _Sink:
+    """
+    Write-only file object for zipfile: since it can't seek, zipfile streams entries
+    with data descriptors, and we hand out whatever was written so far
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        if self.chunks:
+            data = b"".join(self.chunks)
+            self.chunks = []
+            yield data
+
+
+def iter_zip(entries: Iterable[tuple[str, ZipContent]], compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Builds a zip archive on the fly, without temp files, from (name in archive, content) pairs.
+    Content is bytes, a file on disk, or an iterable of bytes chunks. Yields the archive bytes
+    as they are produced so it can be fed to a StreamingResponse.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=compression) as zf:
+        for arcname, content in entries:
+            if isinstance(content, bytes):
+                zf.writestr(arcname, content)
+            elif isinstance(content, Path):
+                zinfo = zipfile.ZipInfo.from_file(content, arcname)
+                zinfo.compress_type = compression
+                with content.open("rb") as src, zf.open(zinfo, "w") as dest:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dest.write(chunk)
+                        yield from sink.drain()
+            else:
+                with zf.open(arcname, "w", force_zip64=True) as dest:
+                    for chunk in content:
+                        dest.write(chunk)
+                        yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
@@ -0,0 +1,39 @@
+import { useEffect, useState } from "react";
+
+// Photos of a whole page in one image: /api/{kind}/contact-sheet maps ids to tiles of that image.
+// `version` is anything that changes when the pictures do, to fetch the map again.
+export function useContactSheet(kind, version) {
+  const [sheet, setSheet] = useState(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    fetch(`/api/${kind}/contact-sheet`)
+      .then((r) => (r.ok ? r.json() : null))
+      .then((s) => {
+        if (!cancelled) setSheet(s);
+      })
+      .catch(() => {
+        if (!cancelled) setSheet(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [kind, version]);
+
+  return sheet;
+}
+
+// Background style showing the tile of `id` at `size` px, null when the sheet doesn't have it
+// (yet): callers then fall back to the single picture route.
+export function tileStyle(sheet, id, size) {
+  const corner = sheet?.tiles?.[id];
+  if (!corner) return null;
+
+  const scale = size / sheet.tile_size;
+  return {
+    backgroundImage: `url(${sheet.image})`,
+    backgroundRepeat: "no-repeat",
+    backgroundSize: `${sheet.width * scale}px ${sheet.height * scale}px`,
+    backgroundPosition: `-${corner[0] * scale}px -${corner[1] * scale}px`,
+  };
+}
@@ -564,18 +564,32 @@ export default function Events() {
               {selected.story && (
                 <div>
                   <h4 style={{ marginBottom: 6 }}>Story</h4>
-                  <div style={{ color: "var(--text)", opacity: 0.95, whiteSpace: "pre-wrap" }}>
-                    {selected.story}
-                  </div>
+                  {selectedDetail?.story_html ? (
+                    <div
+                      style={{ color: "var(--text)", opacity: 0.95 }}
+                      dangerouslySetInnerHTML={{ __html: selectedDetail.story_html }}
+                    />
+                  ) : (
+                    <div style={{ color: "var(--text)", opacity: 0.95, whiteSpace: "pre-wrap" }}>
+                      {selected.story}
+                    </div>
+                  )}
                 </div>
               )}
 
               {selected.notes && (
                 <div>
                   <h4 style={{ marginBottom: 6 }}>Notes</h4>
-                  <div style={{ color: "var(--text)", opacity: 0.95, whiteSpace: "pre-wrap" }}>
-                    {selected.notes}
-                  </div>
+                  {selectedDetail?.notes_html ? (
+                    <div
+                      style={{ color: "var(--text)", opacity: 0.95 }}
+                      dangerouslySetInnerHTML={{ __html: selectedDetail.notes_html }}
+                    />
+                  ) : (
+                    <div style={{ color: "var(--text)", opacity: 0.95, whiteSpace: "pre-wrap" }}>
+                      {selected.notes}
+                    </div>
+                  )}
                 </div>
               )}
 
@@ -610,9 +624,18 @@ export default function Events() {
 
               <div className="event-actions">
                 {selected.script_files && selected.script_files.length > 0 ? (
-                  <a className="k-btn k-btn--subtle" href={`/api/events/${selected.id}/script`} target="_blank" rel="noopener noreferrer">
-                    Download script
-                  </a>
+                  <>
+                    {selected.script_files.map((f, i) => (
+                      <a key={i} className="k-btn k-btn--subtle" href={`/api/events/${selected.id}/scripts/${i}`} target="_blank" rel="noopener noreferrer">
+                        {selected.script_files.length === 1 ? "Download script" : `Script ${i + 1} (${f.split(".").pop()})`}
+                      </a>
+                    ))}
+                    {selected.script_files.length > 1 && (
+                      <a className="k-btn k-btn--subtle" href={`/api/events/${selected.id}/scripts.zip`}>
+                        Download all (.zip)
+                      </a>
+                    )}
+                  </>
                 ) : (
                   <span style={{ color: "var(--muted)", fontFamily: "var(--font-sans)" }}>No script</span>
                 )}
@@ -679,7 +702,7 @@ export default function Events() {
                     </div>
 
                     <div className="k-form-row">
-                      <label>Replace script</label>
+                      <label>Add a script</label>
 
                       <div className="k-filepicker k-filepicker--inline">
                         <label className="k-btn k-btn--subtle k-filepicker__btn">
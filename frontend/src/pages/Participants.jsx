@@ -1,5 +1,9 @@
 import { useEffect, useState } from "react";
 import "./Participants.css";
+import { tileStyle, useContactSheet } from "../contactSheet";
+
+// .k-avatar size
+const AVATAR_SIZE = 44;
 
 export default function Participants() {
   const [items, setItems] = useState([]);
@@ -23,6 +27,8 @@ export default function Participants() {
   const [editIsPlusone, setEditIsPlusone] = useState(false);
   const [editPhotoFile, setEditPhotoFile] = useState(null);
 
+  const sheet = useContactSheet("participants", items.map((p) => p.picture_file).join());
+
   async function loadParticipants() {
     try {
       setLoading(true);
@@ -309,12 +315,24 @@ export default function Participants() {
           <tbody>
             {items.map((p) => {
               const isEditing = editingId === p.id;
+              const tile = p.picture_file && tileStyle(sheet, p.id, AVATAR_SIZE);
 
               return (
                 <tr key={p.id}>
 
                   <td className="k-avatar-cell">
-                    {p.picture_file ? (
+                    {tile ? (
+                      <div
+                        className="k-avatar"
+                        role="img"
+                        style={tile}
+                        onClick={() =>
+                          setLightboxUrl(
+                            `/api/participants/${p.id}/picture?v=${encodeURIComponent(p.picture_file)}`
+                          )
+                        }
+                      />
+                    ) : p.picture_file ? (
                       <img
                         className="k-avatar"
                         src={`/api/participants/${p.id}/picture?v=${encodeURIComponent(p.picture_file)}`}
@@ -1,5 +1,9 @@
 import { useEffect, useState } from "react";
 import "./Speakers.css";
+import { tileStyle, useContactSheet } from "../contactSheet";
+
+// .speaker-avatar size
+const AVATAR_SIZE = 160;
 
 function speakerPictureUrl(s) {
   if (!s.picture_file) return null;
@@ -12,6 +16,10 @@ export default function Speakers() {
   const [selected, setSelected] = useState(null); // speaker object
   const [showPhotoUpload, setShowPhotoUpload] = useState(false);
   const [photoFile, setPhotoFile] = useState(null);
+  // bumped on upload: a photo replaced under the same name leaves picture_file unchanged
+  const [photoVersion, setPhotoVersion] = useState(0);
+
+  const sheet = useContactSheet("speakers", `${photoVersion}:${items.map((s) => s.picture_file).join()}`);
 
   useEffect(() => {
     fetch("/api/speakers")
@@ -57,6 +65,7 @@ export default function Speakers() {
 
     // update currently selected speaker
     setSelected(updated);
+    setPhotoVersion((v) => v + 1);
 
     // reset UI
     setPhotoFile(null);
@@ -71,6 +80,7 @@ export default function Speakers() {
       <div className="speaker-grid">
         {items.map((s) => {
           const url = speakerPictureUrl(s);
+          const tile = url && tileStyle(sheet, s.id, AVATAR_SIZE);
           return (
             <button
               key={s.id}
@@ -83,7 +93,9 @@ export default function Speakers() {
               }}
             >
               <div className="speaker-avatar">
-                {url ? (
+                {tile ? (
+                  <div className="speaker-avatar__tile" role="img" aria-label={s.name || "Speaker"} style={tile} />
+                ) : url ? (
                   <img src={url} alt={s.name || "Speaker"} />
                 ) : (
                   <div className="speaker-avatar--placeholder" aria-hidden="true" />
@@ -0,0 +1,14 @@
+#!/bin/sh
+# Streaming replica of the db service: cloned with pg_basebackup on first start,
+# then follows the primary's WAL (-R writes standby.signal and primary_conninfo).
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_isready -h "$PRIMARY_HOST" -U "$POSTGRES_USER"; do
+        sleep 1
+    done
+    PGPASSWORD="$POSTGRES_PASSWORD" pg_basebackup -h "$PRIMARY_HOST" -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres